@@ -0,0 +1,71 @@
+"""Представление моделей в JSON с выбором полей через `?fields=`."""
+from django.urls import reverse
+
+
+class UnknownField(Exception):
+    pass
+
+
+def _file_url(file):
+    return file.url if file else None
+
+
+POST_FIELDS = {
+    'id': lambda post: post.pk,
+    'text': lambda post: post.text,
+    'pub_date': lambda post: post.pub_date.isoformat(),
+    'author': lambda post: post.author.username,
+    'group': lambda post: post.group.slug if post.group_id else None,
+    'image': lambda post: _file_url(post.image),
+    'thumbnail': lambda post: _file_url(post.thumbnail),
+    'image_width': lambda post: post.image_width,
+    'image_height': lambda post: post.image_height,
+    'image_blurhash': lambda post: post.image_blurhash or None,
+    'comment_count': lambda post: post.comment_count,
+    'version': lambda post: post.version,
+    'url': lambda post: reverse('post', args=[post.author.username, post.pk]),
+}
+
+GROUP_FIELDS = {
+    'id': lambda group: group.pk,
+    'slug': lambda group: group.slug,
+    'title': lambda group: group.title,
+    'description': lambda group: group.description,
+}
+
+COMMENT_FIELDS = {
+    'id': lambda comment: comment.pk,
+    'post': lambda comment: comment.post_id,
+    'author': lambda comment: comment.author.username,
+    'text': lambda comment: comment.text,
+    'created': lambda comment: comment.created.isoformat(),
+}
+
+FOLLOW_FIELDS = {
+    'user': lambda follow: follow.user.username,
+    'author': lambda follow: follow.author.username,
+    'created': lambda follow: follow.created.isoformat(),
+}
+
+USER_FIELDS = {
+    'username': lambda user: user.username,
+    'full_name': lambda user: user.get_full_name(),
+    'posts_count': lambda user: user.stats.posts_count,
+    'followers_count': lambda user: user.stats.followers_count,
+    'following_count': lambda user: user.stats.following_count,
+}
+
+
+def select_fields(available, requested):
+    """Список полей из параметра `fields` (через запятую) или все поля."""
+    if not requested:
+        return list(available)
+    fields = [name.strip() for name in requested.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise UnknownField(', '.join(unknown))
+    return fields
+
+
+def serialize(obj, available, fields):
+    return {name: available[name](obj) for name in fields}
@@ -0,0 +1,175 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.db.models import F
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class ApiTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.reader = User.objects.create_user(
+            username='Subscribed', email='sub@skynet.com',
+            password='qwerty123'
+        )
+        self.group = Group.objects.create(title='Котики', slug='cats')
+        self.posts = [
+            Post.objects.create(
+                text=f'Запись {number}', author=self.user, group=self.group)
+            for number in range(15)
+        ]
+
+    def test_feed_pages(self):
+        response = self.client.get(reverse('api_posts'))
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(len(data['results']), 10)
+        self.assertEqual(data['results'][0]['id'], self.posts[-1].pk)
+        self.assertEqual(data['results'][0]['author'], 'Osol')
+        self.assertEqual(data['results'][0]['group'], 'cats')
+        self.assertIsNone(data['previous'])
+
+        data = self.client.get(data['next']).json()
+        self.assertEqual(
+            [post['id'] for post in data['results']],
+            [post.pk for post in self.posts[4::-1]]
+        )
+        self.assertIsNone(data['next'])
+        self.assertIsNotNone(data['previous'])
+
+        for name, kwargs in (
+            ('api_group_posts', {'slug': 'cats'}),
+            ('api_user_posts', {'username': 'Osol'}),
+        ):
+            data = self.client.get(reverse(name, kwargs=kwargs)).json()
+            self.assertEqual(len(data['results']), 10)
+
+    def test_sparse_fields(self):
+        response = self.client.get(
+            reverse('api_posts'), {'fields': 'id,text'})
+        self.assertEqual(
+            set(response.json()['results'][0]), {'id', 'text'})
+        next_url = response.json()['next']
+        self.assertIn('fields=id%2Ctext', next_url)
+
+        response = self.client.get(reverse('api_posts'), {'fields': 'nope'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_not_modified(self):
+        url = reverse('api_posts')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        post = self.posts[-1]
+        post.text = 'Исправленная запись'
+        post.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        # даты записей правка не меняет, поэтому Last-Modified нет
+        self.assertFalse(response.has_header('Last-Modified'))
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE='Sat, 01 Jan 2000 00:00:00 GMT')
+        self.assertEqual(response.status_code, 200)
+
+    def test_change_unseen_by_feed_cache(self):
+        # правка из другого процесса: поколения локального кэша не растут
+        url = reverse('api_posts')
+        etag = self.client.get(url)['ETag']
+        Post.objects.filter(pk=self.posts[-1].pk).update(
+            text='Правка из другого процесса', version=F('version') + 1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(
+            response.json()['results'][0]['text'],
+            'Правка из другого процесса')
+
+    def test_comments(self):
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader, text='Первый')
+        url = reverse('api_post_comments', kwargs={'post_id': post.pk})
+        response = self.client.get(url)
+        self.assertEqual(
+            [comment['text'] for comment in response.json()['results']],
+            ['Первый']
+        )
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+        Comment.objects.create(post=post, author=self.reader, text='Второй')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(len(response.json()['results']), 2)
+
+    def test_post_groups_and_users(self):
+        post = self.posts[0]
+        data = self.client.get(
+            reverse('api_post', kwargs={'post_id': post.pk})).json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(
+            data['url'], reverse('post', args=['Osol', post.pk]))
+
+        data = self.client.get(reverse('api_groups')).json()
+        self.assertEqual(data['results'][0]['slug'], 'cats')
+
+        Follow.objects.create(user=self.reader, author=self.user)
+        data = self.client.get(
+            reverse('api_user', kwargs={'username': 'Osol'})).json()
+        self.assertEqual(data['posts_count'], 15)
+        self.assertEqual(data['followers_count'], 1)
+        data = self.client.get(reverse(
+            'api_user_following', kwargs={'username': 'Subscribed'})).json()
+        self.assertEqual(data['results'][0]['author'], 'Osol')
+        data = self.client.get(reverse(
+            'api_user_followers', kwargs={'username': 'Osol'})).json()
+        self.assertEqual(data['results'][0]['user'], 'Subscribed')
+
+    def test_user_without_stats_row(self):
+        # как после loaddata: строку счётчиков сигнал не создал
+        Follow.objects.create(user=self.reader, author=self.user)
+        UserStats.objects.filter(user=self.user).delete()
+        response = self.client.get(
+            reverse('api_user', kwargs={'username': 'Osol'}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['posts_count'], 15)
+        self.assertEqual(response.json()['followers_count'], 1)
+
+    def test_follow_feed(self):
+        self.assertEqual(
+            self.client.get(reverse('api_follow_posts')).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.user)
+        self.client.force_login(self.reader)
+        data = self.client.get(reverse('api_follow_posts')).json()
+        self.assertEqual(data['results'][0]['id'], self.posts[-1].pk)
+
+    def test_read_only(self):
+        response = self.client.post(reverse('api_posts'))
+        self.assertEqual(response.status_code, 405)
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get(
+            reverse('api_export_posts'), {'fields': 'id,text'})
+        self.assertTrue(response.streaming)
+        self.assertTrue(response['Content-Type'].startswith(
+            'application/x-ndjson'))
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [{'id': post.pk, 'text': post.text} for post in self.posts]
+        )
@@ -0,0 +1,37 @@
+from django.urls import path
+from . import views
+
+
+urlpatterns = [
+    path('posts/', views.posts, name='api_posts'),
+    path('posts/<int:post_id>/', views.post_detail, name='api_post'),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='api_post_comments'
+    ),
+    path('follow/', views.follow_posts, name='api_follow_posts'),
+    path('groups/', views.groups, name='api_groups'),
+    path(
+        'groups/<slug:slug>/posts/',
+        views.group_posts,
+        name='api_group_posts'
+    ),
+    path('users/<username>/', views.user_detail, name='api_user'),
+    path(
+        'users/<username>/posts/',
+        views.user_posts,
+        name='api_user_posts'
+    ),
+    path(
+        'users/<username>/following/',
+        views.user_following,
+        name='api_user_following'
+    ),
+    path(
+        'users/<username>/followers/',
+        views.user_followers,
+        name='api_user_followers'
+    ),
+    path('export/posts.ndjson', views.export_posts, name='api_export_posts'),
+]
@@ -0,0 +1,250 @@
+"""JSON API только для чтения.
+
+Ленты берутся теми же запросами и из того же кэша страниц, что и
+HTML-представления. ETag строится по (id, версия) записей страницы, так
+что неизменившаяся лента отвечает 304 без сериализации.
+"""
+import hashlib
+import json
+
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import urlencode
+from django.views.decorators.http import require_safe
+
+from posts import conditional, feed_cache, timeline
+from posts.models import Follow, Group, Post, UserStats
+from posts.paginator import CursorPaginator
+
+from .serializers import (
+    COMMENT_FIELDS, FOLLOW_FIELDS, GROUP_FIELDS, POST_FIELDS, USER_FIELDS,
+    UnknownField, select_fields, serialize
+)
+
+User = get_user_model()
+
+# Совпадает с размером страницы HTML-лент, чтобы страницы в кэше были общими.
+PAGE_SIZE = 10
+COMMENTS_PAGE_SIZE = 50
+EXPORT_CHUNK_SIZE = 500
+
+
+def error(message, status):
+    return JsonResponse({'detail': message}, status=status)
+
+
+def make_etag(*parts):
+    raw = json.dumps(parts, separators=(',', ':'), default=str)
+    return '"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def page_url(request, **cursor):
+    params = {key: value for key, value in request.GET.items()
+              if key not in ('after', 'before')}
+    params.update(cursor)
+    return '{}?{}'.format(request.path, urlencode(params))
+
+
+def respond(request, build, etag):
+    """Ответить 304 по If-None-Match или собрать JSON.
+
+    Last-Modified не отдаём: ни одна дата записи не меняется от правки
+    или нового комментария, и клиент с одним If-Modified-Since получал
+    бы 304 на изменившиеся данные. Версии записей есть только в ETag.
+    """
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = JsonResponse(build())
+    response['ETag'] = etag
+    return response
+
+
+def page_body(request, page, available, fields):
+    return {
+        'results': [serialize(obj, available, fields) for obj in page],
+        'next': page.has_next() and page_url(
+            request, after=page.next_cursor) or None,
+        'previous': page.has_previous() and page_url(
+            request, before=page.previous_cursor) or None,
+    }
+
+
+def paginated(request, page, available, fields):
+    """Ответ со страницей курсорной пагинации."""
+    etag = make_etag(
+        [(obj.pk, getattr(obj, 'version', None)) for obj in page],
+        page.next_cursor, page.previous_cursor, fields
+    )
+    return respond(
+        request,
+        lambda: page_body(request, page, available, fields),
+        etag,
+    )
+
+
+def fields_or_error(request, available):
+    try:
+        return select_fields(available, request.GET.get('fields')), None
+    except UnknownField as exc:
+        return None, error(f'Неизвестные поля: {exc}', 400)
+
+
+def feed(request, scope, queryset):
+    fields, failure = fields_or_error(request, POST_FIELDS)
+    if failure:
+        return failure
+    paginator = CursorPaginator(queryset, PAGE_SIZE)
+    if scope is None:
+        page = paginator.get_page(request)
+    else:
+        page = feed_cache.get_page(
+            scope, paginator, request,
+            conditional.feed_state(paginator, request))
+    return paginated(request, page, POST_FIELDS, fields)
+
+
+@require_safe
+def posts(request):
+    return feed(request, 'index', Post.objects.feed())
+
+
+@require_safe
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return feed(
+        request, feed_cache.group_scope(group.pk), group.posts.feed())
+
+
+@require_safe
+def user_posts(request, username):
+    author = get_object_or_404(User, username=username)
+    return feed(
+        request, feed_cache.author_scope(author.pk), author.posts.feed())
+
+
+@require_safe
+def follow_posts(request):
+    if not request.user.is_authenticated:
+        return error('Требуется вход на сайт.', 401)
+    return feed(request, None, timeline.followed_posts(request.user))
+
+
+@require_safe
+def post_detail(request, post_id):
+    fields, failure = fields_or_error(request, POST_FIELDS)
+    if failure:
+        return failure
+    post = get_object_or_404(Post.objects.feed(), pk=post_id)
+    return respond(
+        request,
+        lambda: serialize(post, POST_FIELDS, fields),
+        make_etag(post.pk, post.version, fields),
+    )
+
+
+@require_safe
+def post_comments(request, post_id):
+    fields, failure = fields_or_error(request, COMMENT_FIELDS)
+    if failure:
+        return failure
+    post = get_object_or_404(
+        Post.objects.only('version'), pk=post_id)
+    # версия записи растёт с каждым комментарием: 304 без чтения комментариев
+    etag = make_etag(
+        post.pk, post.version, request.GET.get('after'),
+        request.GET.get('before'), fields
+    )
+    paginator = CursorPaginator(
+        post.comments.select_related('author'),
+        COMMENTS_PAGE_SIZE,
+        ordering=('created', 'id'),
+    )
+    return respond(
+        request,
+        lambda: page_body(
+            request, paginator.get_page(request), COMMENT_FIELDS, fields),
+        etag,
+    )
+
+
+@require_safe
+def groups(request):
+    fields, failure = fields_or_error(request, GROUP_FIELDS)
+    if failure:
+        return failure
+    group_list = list(Group.objects.order_by('title'))
+    return respond(
+        request,
+        lambda: {'results': [
+            serialize(group, GROUP_FIELDS, fields) for group in group_list
+        ]},
+        make_etag([serialize(group, GROUP_FIELDS, list(GROUP_FIELDS))
+                   for group in group_list], fields),
+    )
+
+
+@require_safe
+def user_detail(request, username):
+    fields, failure = fields_or_error(request, USER_FIELDS)
+    if failure:
+        return failure
+    user = get_object_or_404(
+        User.objects.select_related('stats'), username=username)
+    # строки счётчиков может не быть: of() создаёт её в user.stats
+    UserStats.of(user)
+    data = serialize(user, USER_FIELDS, fields)
+    return respond(request, lambda: data, make_etag(data))
+
+
+def follows(request, queryset):
+    fields, failure = fields_or_error(request, FOLLOW_FIELDS)
+    if failure:
+        return failure
+    paginator = CursorPaginator(
+        queryset.select_related('user', 'author'),
+        PAGE_SIZE,
+        ordering=('-created', '-id'),
+    )
+    return paginated(
+        request, paginator.get_page(request), FOLLOW_FIELDS, fields)
+
+
+@require_safe
+def user_following(request, username):
+    user = get_object_or_404(User, username=username)
+    return follows(request, Follow.objects.filter(user=user))
+
+
+@require_safe
+def user_followers(request, username):
+    author = get_object_or_404(User, username=username)
+    return follows(request, Follow.objects.filter(author=author))
+
+
+@require_safe
+def export_posts(request):
+    """Все записи построчным JSON (NDJSON) без загрузки в память.
+
+    Фильтры: `?author=<username>` и `?group=<slug>`.
+    """
+    fields, failure = fields_or_error(request, POST_FIELDS)
+    if failure:
+        return failure
+    queryset = Post.objects.feed().order_by('pub_date', 'id')
+    if request.GET.get('author'):
+        queryset = queryset.filter(author__username=request.GET['author'])
+    if request.GET.get('group'):
+        queryset = queryset.filter(group__slug=request.GET['group'])
+
+    def lines():
+        for post in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            yield json.dumps(
+                serialize(post, POST_FIELDS, fields), ensure_ascii=False
+            ) + '\n'
+
+    response = StreamingHttpResponse(
+        lines(), content_type='application/x-ndjson; charset=utf-8')
+    response['Content-Disposition'] = 'attachment; filename="posts.ndjson"'
+    return response
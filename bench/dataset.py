@@ -0,0 +1,241 @@
+"""Синтетические данные для замеров и профилирования.
+
+Строки создаются через bulk_create пачками, каждая пачка в своей
+транзакции. Сигналы при этом не срабатывают, поэтому счётчики, ленты
+подписок и поисковый индекс затем пересчитываются командами rebuild_*.
+
+Активность распределена по Ципфу: немногие авторы пишут большую часть
+записей и собирают большую часть подписчиков, как в настоящих соцсетях.
+Всё определяется зерном генератора, так что замеры воспроизводимы.
+"""
+import itertools
+import os
+import random
+from contextlib import contextmanager
+from datetime import timedelta
+from io import StringIO
+
+from PIL import Image
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts import timeline
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+PASSWORD = 'bench-password'
+WORDS = (
+    'котики', 'книга', 'погода', 'город', 'море', 'работа', 'кофе', 'утро',
+    'музыка', 'фильм', 'дорога', 'лето', 'зима', 'программа', 'ошибка',
+    'проект', 'друзья', 'вечер', 'новости', 'путешествие',
+)
+IMAGE_POOL_SIZE = 20
+IMAGE_SIZE = (960, 540)
+
+
+@contextmanager
+def explicit_dates(*fields):
+    """Временно отключить auto_now_add, чтобы задать даты самим."""
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def sentence(rng, words=12):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+class Zipf:
+    """Выбор из последовательности с вероятностью ~ 1 / ранг ** s."""
+
+    def __init__(self, population, s, rng):
+        self.population = population
+        self.rng = rng
+        self.cum_weights = list(itertools.accumulate(
+            1 / rank ** s for rank in range(1, len(population) + 1)
+        ))
+
+    def sample(self, k=1):
+        return self.rng.choices(
+            self.population, cum_weights=self.cum_weights, k=k)
+
+    def choice(self):
+        return self.sample()[0]
+
+
+def batches(items, size):
+    iterator = iter(items)
+    while True:
+        batch = list(itertools.islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def image_pool(prefix, write):
+    """Имена картинок-заглушек; с write=True файлы создаются в MEDIA_ROOT."""
+    names = [f'posts/{prefix}-{number}.jpg'
+             for number in range(IMAGE_POOL_SIZE)]
+    if write:
+        rng = random.Random(prefix)
+        for name in names:
+            path = os.path.join(settings.MEDIA_ROOT, name)
+            if os.path.exists(path):
+                continue
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            color = tuple(rng.randrange(256) for _ in range(3))
+            Image.new('RGB', IMAGE_SIZE, color).save(path, 'JPEG')
+    return names
+
+
+class Generator:
+
+    def __init__(self, prefix='bench', seed=1, skew=1.1, batch_size=5000,
+                 progress=None):
+        self.prefix = prefix
+        self.rng = random.Random(seed)
+        self.skew = skew
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+        self.now = timezone.now()
+
+    def insert(self, model, objects, total=None):
+        """bulk_create пачками по транзакции на пачку."""
+        fields = [field for field in model._meta.concrete_fields
+                  if not field.primary_key]
+        size = min(self.batch_size, max(
+            connection.ops.bulk_batch_size(fields, [None]), 1))
+        done = 0
+        for batch in batches(objects, size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            done += len(batch)
+            self.progress('{}: {}{}'.format(
+                model._meta.verbose_name_plural, done,
+                f'/{total}' if total else ''
+            ))
+
+    def new_ids(self, model, last_id):
+        return list(model.objects.filter(pk__gt=last_id).order_by('pk')
+                    .values_list('pk', flat=True))
+
+    @staticmethod
+    def last_id(model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first() or 0
+
+    def users(self, count):
+        password = make_password(PASSWORD)
+        last_id = self.last_id(User)
+        self.insert(User, (
+            User(username=f'{self.prefix}{number}', password=password,
+                 first_name=self.rng.choice(WORDS).capitalize())
+            for number in range(count)
+        ), count)
+        return self.new_ids(User, last_id)
+
+    def groups(self, count):
+        last_id = self.last_id(Group)
+        self.insert(Group, (
+            Group(title=f'Сообщество {number}',
+                  slug=f'{self.prefix}-{number}',
+                  description=sentence(self.rng))
+            for number in range(count)
+        ), count)
+        return self.new_ids(Group, last_id)
+
+    def follows(self, user_ids, per_user):
+        """У каждого пользователя в среднем per_user подписок на авторов,
+        популярных по Ципфу.
+        """
+        authors = Zipf(user_ids, self.skew, self.rng)
+
+        def pairs():
+            for user_id in user_ids:
+                count = min(
+                    int(self.rng.expovariate(1 / per_user)) if per_user
+                    else 0,
+                    len(user_ids) - 1
+                )
+                chosen = {author for author in authors.sample(count)
+                          if author != user_id}
+                for author_id in sorted(chosen):
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, pairs())
+
+    def posts(self, count, user_ids, group_ids, image_ratio, images):
+        """Записи идут по времени: id растёт вместе с pub_date."""
+        authors = Zipf(user_ids, self.skew, self.rng)
+        step = timedelta(days=365) / max(count, 1)
+        last_id = self.last_id(Post)
+
+        def objects():
+            start = self.now - timedelta(days=365)
+            for number in range(count):
+                yield Post(
+                    text=sentence(self.rng, self.rng.randint(5, 40)),
+                    author_id=authors.choice(),
+                    group_id=(self.rng.choice(group_ids)
+                              if group_ids and self.rng.random() < 0.7
+                              else None),
+                    image=(self.rng.choice(images)
+                           if images and self.rng.random() < image_ratio
+                           else None),
+                    pub_date=start + step * number,
+                )
+
+        with explicit_dates(Post._meta.get_field('pub_date')):
+            self.insert(Post, objects(), count)
+        return self.new_ids(Post, last_id)
+
+    def comments(self, count, post_ids, user_ids):
+        """Больше всего комментариев у свежих записей."""
+        posts = Zipf(post_ids[::-1], self.skew, self.rng)
+        authors = Zipf(user_ids, self.skew, self.rng)
+
+        def objects():
+            for number in range(count):
+                yield Comment(
+                    post_id=posts.choice(),
+                    author_id=authors.choice(),
+                    text=sentence(self.rng, self.rng.randint(3, 15)),
+                    created=self.now - timedelta(seconds=count - number),
+                )
+
+        with explicit_dates(Comment._meta.get_field('created')):
+            self.insert(Comment, objects(), count)
+
+
+def generate(users=100, groups=10, posts=1000, comments=2000, follows=10,
+             image_ratio=0.1, seed=1, prefix='bench', skew=1.1,
+             batch_size=5000, write_images=False, derived=True,
+             progress=None):
+    generator = Generator(prefix, seed, skew, batch_size, progress)
+    user_ids = generator.users(users)
+    group_ids = generator.groups(groups)
+    generator.follows(user_ids, follows)
+    images = image_pool(prefix, write_images) if image_ratio else []
+    post_ids = generator.posts(posts, user_ids, group_ids, image_ratio, images)
+    if post_ids:
+        generator.comments(comments, post_ids, user_ids)
+    if derived:
+        rebuild_derived()
+
+
+def rebuild_derived():
+    out = StringIO()
+    call_command('rebuild_user_stats', stdout=out)
+    call_command('rebuild_comment_counts', stdout=out)
+    if timeline.is_enabled():
+        call_command('rebuild_timelines', stdout=out)
+    call_command('rebuild_search_index', stdout=out)
@@ -0,0 +1,105 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.test.runner import DiscoverRunner
+from django.test.utils import (
+    override_settings, setup_test_environment, teardown_test_environment
+)
+
+from bench import dataset
+from bench.runner import SCENARIOS, Runner, clear_caches, compare
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет горячие пути Yatube на синтетических данных во временной '
+        'тестовой базе: p50/p95/p99, запросы к БД и RSS'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=5000)
+        parser.add_argument('--follows', type=int, default=10,
+                            help='Подписок на пользователя')
+        parser.add_argument('--image-ratio', type=float, default=0.1)
+        parser.add_argument('--requests', type=int, default=200,
+                            help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--scenario', action='append',
+                            choices=SCENARIOS, dest='scenarios')
+        parser.add_argument('--save-baseline', metavar='FILE')
+        parser.add_argument('--baseline', metavar='FILE')
+        parser.add_argument('--tolerance', type=float, default=0.2,
+                            help='Допустимый рост p95, доля')
+        parser.add_argument(
+            '--configured-cache', action='store_true',
+            help='Мерить с кэшами из настроек (они будут очищены), а не '
+                 'с отдельным LocMemCache'
+        )
+
+    def handle(self, *args, **options):
+        isolated_cache = override_settings(CACHES={'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'bench',
+        }})
+        if not options['configured_cache']:
+            isolated_cache.enable()
+        try:
+            results = self.run_bench(options)
+        finally:
+            if not options['configured_cache']:
+                isolated_cache.disable()
+        self.report(results, options)
+
+    def run_bench(self, options):
+        setup_test_environment()
+        runner = DiscoverRunner(verbosity=0)
+        old_config = runner.setup_databases()
+        try:
+            clear_caches()
+            dataset.generate(
+                users=options['users'],
+                groups=options['groups'],
+                posts=options['posts'],
+                comments=options['comments'],
+                follows=options['follows'],
+                image_ratio=options['image_ratio'],
+                seed=options['seed'],
+            )
+            return self.measure(options)
+        finally:
+            runner.teardown_databases(old_config)
+            teardown_test_environment()
+
+    def report(self, results, options):
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as baseline:
+                json.dump(results, baseline, indent=2)
+        if options['baseline']:
+            with open(options['baseline']) as baseline:
+                regressions = compare(
+                    results, json.load(baseline), options['tolerance'])
+            if regressions:
+                raise CommandError(
+                    'Регрессии:\n' + '\n'.join(regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def measure(self, options):
+        bench = Runner(seed=options['seed'])
+        self.stdout.write(
+            f'{"сценарий":<14} {"p50, мс":>9} {"p95, мс":>9} '
+            f'{"p99, мс":>9} {"запросов":>9} {"RSS, МБ":>9}'
+        )
+        results = {}
+        for scenario in options['scenarios'] or SCENARIOS:
+            result = results[scenario] = bench.run(
+                scenario, options['requests'], options['warmup'])
+            self.stdout.write(
+                f'{scenario:<14} {result["p50"]:>9.2f} {result["p95"]:>9.2f} '
+                f'{result["p99"]:>9.2f} {result["queries"]:>9.1f} '
+                f'{result["rss_mb"]:>9.1f}'
+            )
+        return results
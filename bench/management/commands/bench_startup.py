@@ -0,0 +1,34 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from bench import startup
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время импорта wsgi.application и накладные расходы '
+        'middleware на запрос в каждом окружении YATUBE_ENV'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--env', action='append', dest='environments',
+                            choices=settings.ENVIRONMENTS)
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Свежих процессов на окружение')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Запросов через цепочку middleware')
+
+    def handle(self, *args, **options):
+        self.stdout.write(
+            f'{"окружение":<10} {"импорт, мс":>11} {"модулей":>8} '
+            f'{"middleware":>11} {"на запрос, мкс":>15} {"toolbar":>8}'
+        )
+        for environment in options['environments'] or settings.ENVIRONMENTS:
+            result = startup.measure(
+                environment, options['repeat'], options['requests'])
+            self.stdout.write(
+                f'{environment:<10} {result["import_ms"]:>11.1f} '
+                f'{result["modules"]:>8} {result["middleware"]:>11} '
+                f'{result["middleware_us"]:>15.1f} '
+                f'{"да" if result["debug_toolbar"] else "нет":>8}'
+            )
@@ -0,0 +1,59 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from bench import dataset
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, сообществами, '
+        'подписками, записями и комментариями с распределением по Ципфу'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=100000)
+        parser.add_argument('--comments', type=int, default=200000)
+        parser.add_argument('--follows', type=int, default=20,
+                            help='Подписок на пользователя в среднем')
+        parser.add_argument('--image-ratio', type=float, default=0)
+        parser.add_argument(
+            '--write-images', action='store_true',
+            help='Создать картинки-заглушки в MEDIA_ROOT/posts/')
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель распределения Ципфа')
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--prefix', default='seed',
+                            help='Префикс имён пользователей и slug')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--skip-derived', action='store_true',
+            help='Не пересчитывать счётчики, ленты и поисковый индекс')
+
+    def handle(self, *args, **options):
+        if User.objects.filter(
+                username__startswith=options['prefix']).exists():
+            raise CommandError(
+                f'Пользователи с префиксом «{options["prefix"]}» уже есть, '
+                'укажите другой --prefix'
+            )
+        progress = self.stdout.write if options['verbosity'] > 1 else None
+        dataset.generate(
+            users=options['users'],
+            groups=options['groups'],
+            posts=options['posts'],
+            comments=options['comments'],
+            follows=options['follows'],
+            image_ratio=options['image_ratio'],
+            seed=options['seed'],
+            prefix=options['prefix'],
+            skew=options['skew'],
+            batch_size=options['batch_size'],
+            write_images=options['write_images'],
+            derived=not options['skip_derived'],
+            progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS('База заполнена'))
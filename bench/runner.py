@@ -0,0 +1,136 @@
+"""Прогон сценариев через тестовый клиент со всем стеком middleware."""
+import math
+import os
+import random
+import resource
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+SCENARIOS = (
+    'index', 'group_posts', 'profile', 'post_view', 'follow_index',
+    'add_comment', 'new_post',
+)
+AUTHENTICATED = ('follow_index', 'add_comment', 'new_post')
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу."""
+    ordered = sorted(values)
+    if not ordered:
+        return None
+    rank = max(1, math.ceil(q / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def rss_mb():
+    """Текущий RSS процесса; без /proc — пиковый."""
+    try:
+        with open('/proc/self/statm') as statm:
+            pages = int(statm.read().split()[1])
+        return pages * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Runner:
+
+    def __init__(self, seed=1):
+        self.rng = random.Random(seed)
+        self.client = Client()
+        self.users = list(User.objects.values_list('username', flat=True))
+        self.groups = list(Group.objects.values_list('slug', flat=True))
+        self.posts = list(
+            Post.objects.values_list('pk', 'author__username'))
+        if not (self.users and self.posts):
+            raise ValueError('В базе нет пользователей или записей')
+
+    def request(self, scenario):
+        rng = self.rng
+        if scenario == 'index':
+            return 'get', reverse('index'), None
+        if scenario == 'group_posts':
+            return 'get', reverse(
+                'group_posts', args=[rng.choice(self.groups)]), None
+        if scenario == 'profile':
+            return 'get', reverse(
+                'profile', args=[rng.choice(self.users)]), None
+        post_id, username = rng.choice(self.posts)
+        if scenario == 'post_view':
+            return 'get', reverse('post', args=[username, post_id]), None
+        if scenario == 'follow_index':
+            return 'get', reverse('follow_index'), None
+        if scenario == 'add_comment':
+            return 'post', reverse('add_comment', args=[username, post_id]), {
+                'text': 'Комментарий из замера'}
+        if scenario == 'new_post':
+            return 'post', reverse('new_post'), {'text': 'Запись из замера'}
+        raise ValueError(scenario)
+
+    def run(self, scenario, requests, warmup=5):
+        """Замер одного сценария: задержки в мс, запросы к БД и RSS."""
+        self.client.logout()
+        if scenario in AUTHENTICATED:
+            self.client.force_login(
+                User.objects.get(username=self.rng.choice(self.users)))
+        for _ in range(warmup):
+            self.call(scenario)
+        latencies = []
+        queries = 0
+        for _ in range(requests):
+            with CaptureQueriesContext(connection) as captured:
+                latencies.append(self.call(scenario))
+            queries += len(captured)
+        return {
+            'requests': requests,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'queries': queries / requests,
+            'rss_mb': rss_mb(),
+        }
+
+    def call(self, scenario):
+        method, url, data = self.request(scenario)
+        started = time.perf_counter()
+        response = getattr(self.client, method)(url, data)
+        elapsed = (time.perf_counter() - started) * 1000
+        if response.status_code >= 400:
+            raise RuntimeError(f'{url}: HTTP {response.status_code}')
+        return elapsed
+
+
+def clear_caches():
+    for alias in settings.CACHES:
+        caches[alias].clear()
+
+
+def compare(results, baseline, tolerance):
+    """Регрессии относительно сохранённого замера.
+
+    Задержка p95 может вырасти не больше чем на tolerance, число
+    запросов к БД расти не должно.
+    """
+    regressions = []
+    for scenario, result in results.items():
+        before = baseline.get(scenario)
+        if before is None:
+            continue
+        if result['p95'] > before['p95'] * (1 + tolerance):
+            regressions.append(
+                f'{scenario}: p95 {before["p95"]:.2f} → {result["p95"]:.2f} мс')
+        if result['queries'] > before['queries']:
+            regressions.append(
+                f'{scenario}: запросов {before["queries"]:.1f} → '
+                f'{result["queries"]:.1f}')
+    return regressions
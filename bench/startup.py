@@ -0,0 +1,100 @@
+"""Замер старта воркера и накладных расходов middleware по окружениям.
+
+Настройки Django читаются один раз на процесс, поэтому каждое окружение
+(YATUBE_ENV) меряется в отдельном интерпретаторе: он импортирует
+yatube.wsgi и прогоняет запросы через цепочку MIDDLEWARE вокруг пустого
+представления и без неё.
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+
+CHILD = (
+    'import time; started = time.perf_counter(); import yatube.wsgi; '
+    'elapsed = time.perf_counter() - started; '
+    'from bench.startup import child; child(elapsed, {requests})'
+)
+WARMUP = 20
+# адрес не из INTERNAL_IPS: как у обычного посетителя, которому
+# debug_toolbar себя не показывает, но проверку всё равно выполняет
+REMOTE_ADDR = '203.0.113.1'
+
+
+def middleware_chain(paths):
+    from django.core.exceptions import MiddlewareNotUsed
+    from django.http import HttpResponse
+    from django.utils.module_loading import import_string
+
+    def handler(request):
+        return HttpResponse('<html><body></body></html>')
+
+    for path in reversed(paths):
+        try:
+            handler = import_string(path)(handler)
+        except MiddlewareNotUsed:
+            pass
+    return handler
+
+
+def per_request(handler, requests):
+    from django.test import RequestFactory
+
+    factory = RequestFactory()
+    samples = []
+    for number in range(WARMUP + requests):
+        request = factory.get('/', REMOTE_ADDR=REMOTE_ADDR)
+        started = time.perf_counter()
+        handler(request)
+        if number >= WARMUP:
+            samples.append(time.perf_counter() - started)
+    return statistics.median(samples)
+
+
+def child(import_seconds, requests):
+    """Выполняется в дочернем процессе сразу после импорта yatube.wsgi."""
+    modules = len(sys.modules)
+    toolbar = 'debug_toolbar' in sys.modules
+    full = per_request(middleware_chain(settings.MIDDLEWARE), requests)
+    bare = per_request(middleware_chain([]), requests)
+    print(json.dumps({
+        'import_ms': import_seconds * 1000,
+        'modules': modules,
+        'debug_toolbar': toolbar,
+        'middleware': len(settings.MIDDLEWARE),
+        'middleware_us': max(full - bare, 0) * 1e6,
+    }))
+
+
+def run_child(environment, requests):
+    env = dict(
+        os.environ,
+        YATUBE_ENV=environment,
+        DJANGO_SETTINGS_MODULE='yatube.settings',
+    )
+    output = subprocess.run(
+        [sys.executable, '-c', CHILD.format(requests=requests)],
+        cwd=settings.BASE_DIR,
+        env=env,
+        stdout=subprocess.PIPE,
+        check=True,
+        universal_newlines=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def measure(environment, repeat=5, requests=2000):
+    """Медианы по `repeat` свежим процессам одного окружения."""
+    runs = [run_child(environment, requests) for _ in range(repeat)]
+    return {
+        'import_ms': statistics.median(run['import_ms'] for run in runs),
+        'modules': runs[-1]['modules'],
+        'debug_toolbar': runs[-1]['debug_toolbar'],
+        'middleware': runs[-1]['middleware'],
+        'middleware_us': statistics.median(
+            run['middleware_us'] for run in runs),
+    }
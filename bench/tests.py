@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.db.models import Count
+from django.test import TestCase, override_settings
+
+from bench import dataset, startup
+from bench.runner import SCENARIOS, Runner, compare, percentile
+from posts.models import Comment, Follow, Post, TimelineEntry, UserStats
+
+User = get_user_model()
+
+
+class BenchTest(TestCase):
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 95), 95)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([7], 99), 7)
+        self.assertIsNone(percentile([], 50))
+
+    def test_dataset_and_scenarios(self):
+        dataset.generate(users=10, groups=2, posts=30, comments=40,
+                         follows=3)
+        self.assertEqual(Post.objects.count(), 30)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+        self.assertEqual(UserStats.objects.count(), 10)
+        self.assertEqual(
+            sum(Post.objects.values_list('comment_count', flat=True)), 40)
+
+        bench = Runner(seed=1)
+        for scenario in SCENARIOS:
+            with self.subTest(scenario=scenario):
+                result = bench.run(scenario, requests=3, warmup=1)
+                self.assertLessEqual(result['p50'], result['p99'])
+                self.assertGreater(result['rss_mb'], 0)
+
+    def test_startup(self):
+        out = StringIO()
+        call_command('bench_startup', env=['prod'], repeat=1, requests=5,
+                     stdout=out)
+        self.assertIn('prod', out.getvalue())
+        result = startup.measure('prod', repeat=1, requests=5)
+        self.assertFalse(result['debug_toolbar'])
+        self.assertGreater(result['import_ms'], 0)
+
+    def test_compare(self):
+        baseline = {'index': {'p95': 10, 'queries': 3}}
+        self.assertEqual(
+            compare({'index': {'p95': 11, 'queries': 3}}, baseline, 0.2), [])
+        self.assertEqual(len(compare(
+            {'index': {'p95': 13, 'queries': 4}}, baseline, 0.2)), 2)
+
+
+class SeedTest(TestCase):
+
+    def setUp(self):
+        self.media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media)
+
+    def seed(self, prefix, **options):
+        with override_settings(MEDIA_ROOT=self.media):
+            call_command(
+                'seed', prefix=prefix, users=30, groups=3, posts=300,
+                comments=200, follows=5, stdout=StringIO(), **options
+            )
+
+    def posts(self, prefix):
+        return list(
+            Post.objects.filter(author__username__startswith=prefix)
+            .order_by('pk').values_list('text', 'author__username')
+        )
+
+    def test_deterministic_and_skewed(self):
+        self.seed('a', seed=7)
+        self.seed('b', seed=7)
+        self.assertEqual(
+            [(text, name[1:]) for text, name in self.posts('a')],
+            [(text, name[1:]) for text, name in self.posts('b')],
+        )
+        counts = sorted(
+            Post.objects.filter(author__username__startswith='a')
+            .order_by().values('author').annotate(total=Count('pk'))
+            .values_list('total', flat=True),
+            reverse=True
+        )
+        self.assertGreater(counts[0], 5 * counts[len(counts) // 2])
+        self.assertEqual(
+            UserStats.objects.get(user__username='a0').posts_count,
+            counts[0]
+        )
+        self.assertTrue(TimelineEntry.objects.exists())
+
+        with self.assertRaises(CommandError):
+            self.seed('a')
+
+    def test_placeholder_images(self):
+        self.seed('img', image_ratio=1, write_images=True)
+        image = Post.objects.filter(
+            author__username__startswith='img').first().image
+        self.assertTrue(
+            os.path.exists(os.path.join(self.media, image.name)))
@@ -0,0 +1,92 @@
+import base64
+from email.mime.base import MIMEBase
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends.base import BaseEmailBackend
+
+from .registry import task
+
+
+def encode_content(content):
+    if isinstance(content, bytes):
+        return {'base64': base64.b64encode(content).decode('ascii')}
+    return {'text': content}
+
+
+def decode_content(content):
+    if 'base64' in content:
+        return base64.b64decode(content['base64'])
+    return content['text']
+
+
+def serialize(message):
+    """Письмо в виде JSON для очереди.
+
+    None, если письмо так не передать: вложения готовыми MIME-частями
+    отправляются сразу.
+    """
+    attachments = []
+    for attachment in message.attachments:
+        if isinstance(attachment, MIMEBase):
+            return None
+        filename, content, mimetype = attachment
+        attachments.append([filename, encode_content(content), mimetype])
+    return {
+        'subject': message.subject,
+        'body': message.body,
+        'from_email': message.from_email,
+        'to': list(message.to),
+        'cc': list(message.cc),
+        'bcc': list(message.bcc),
+        'reply_to': list(message.reply_to),
+        'headers': dict(message.extra_headers),
+        'content_subtype': message.content_subtype,
+        'alternatives': [
+            [encode_content(content), mimetype]
+            for content, mimetype in getattr(message, 'alternatives', [])
+        ],
+        'attachments': attachments,
+    }
+
+
+@task
+def send_email(message):
+    email = EmailMultiAlternatives(
+        subject=message['subject'],
+        body=message['body'],
+        from_email=message['from_email'],
+        to=message['to'],
+        cc=message['cc'],
+        bcc=message['bcc'],
+        reply_to=message['reply_to'],
+        headers=message['headers'],
+        connection=get_connection(settings.JOBS_EMAIL_BACKEND),
+    )
+    email.content_subtype = message.get('content_subtype', 'plain')
+    for content, mimetype in message['alternatives']:
+        # в задачах, поставленных раньше, содержимое — просто строка
+        if isinstance(content, dict):
+            content = decode_content(content)
+        email.attach_alternative(content, mimetype)
+    for filename, content, mimetype in message.get('attachments', []):
+        email.attach(filename, decode_content(content), mimetype)
+    email.send()
+
+
+class QueuedEmailBackend(BaseEmailBackend):
+    """Ставит письма в очередь; отправляет их воркер через
+    JOBS_EMAIL_BACKEND."""
+
+    def send_messages(self, email_messages):
+        immediate = []
+        for message in email_messages:
+            payload = serialize(message)
+            if payload is None:
+                immediate.append(message)
+            else:
+                send_email.delay(payload)
+        if immediate:
+            get_connection(settings.JOBS_EMAIL_BACKEND).send_messages(
+                immediate)
+        return len(email_messages)
@@ -0,0 +1,118 @@
+import logging
+import os
+import signal
+import socket
+import time
+from concurrent.futures import (
+    FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+)
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.db.models import Avg, Count, Max, Q
+
+from jobs import queue
+from jobs.models import Job
+
+logger = logging.getLogger(__name__)
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди в пуле потоков или процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument(
+            '--processes', action='store_true',
+            help='Пул процессов вместо пула потоков'
+        )
+        parser.add_argument('--poll', type=float, default=1.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Выполнить готовые задачи и завершиться'
+        )
+        parser.add_argument(
+            '--keep-days', type=int, default=7,
+            help='Сколько дней хранить выполненные задачи'
+        )
+        parser.add_argument(
+            '--stats', action='store_true',
+            help='Показать метрики по задачам и завершиться'
+        )
+
+    def handle(self, *args, **options):
+        if options['stats']:
+            return self.print_stats()
+        self.stopping = False
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        concurrency = options['concurrency']
+        if options['processes']:
+            # дочерние процессы не должны делить соединения с родителем
+            connections.close_all()
+            executor = ProcessPoolExecutor(concurrency)
+        else:
+            executor = ThreadPoolExecutor(concurrency)
+        keep = timedelta(days=options['keep_days'])
+        in_flight = set()
+        last_prune = 0
+        with executor:
+            while not self.stopping:
+                claimed = []
+                if len(in_flight) < concurrency:
+                    claimed = queue.claim(
+                        worker_id, limit=concurrency - len(in_flight))
+                for job_id in claimed:
+                    in_flight.add(
+                        executor.submit(queue.execute_in_pool, job_id))
+                if options['once'] and not claimed and not in_flight:
+                    break
+                if in_flight:
+                    done, in_flight = wait(
+                        in_flight, timeout=options['poll'],
+                        return_when=FIRST_COMPLETED
+                    )
+                    for future in done:
+                        if future.exception() is not None:
+                            logger.error(
+                                'Воркер не смог обработать задачу',
+                                exc_info=future.exception()
+                            )
+                elif not claimed:
+                    time.sleep(options['poll'])
+                if time.monotonic() - last_prune > 3600:
+                    queue.prune(keep)
+                    last_prune = time.monotonic()
+
+    def stop(self, signum, frame):
+        self.stopping = True
+
+    def print_stats(self):
+        rows = (
+            Job.objects.order_by('name').values('name').annotate(
+                total=Count('pk'),
+                queued=Count('pk', filter=Q(status=Job.QUEUED)),
+                running=Count('pk', filter=Q(status=Job.RUNNING)),
+                done=Count('pk', filter=Q(status=Job.DONE)),
+                failed=Count('pk', filter=Q(status=Job.FAILED)),
+                avg_wait=Avg('wait_time'),
+                avg_run=Avg('run_time'),
+                max_run=Max('run_time'),
+                retries=Count('pk', filter=Q(attempts__gt=1)),
+            )
+        )
+        for row in rows:
+            self.stdout.write(
+                '{name}: всего {total}, в очереди {queued}, '
+                'выполняется {running}, готово {done}, ошибок {failed}, '
+                'повторов {retries}, ожидание {avg_wait:.3f} с, '
+                'выполнение {avg_run:.3f} с (макс. {max_run:.3f} с)'.format(
+                    **{
+                        key: value if value is not None else 0
+                        for key, value in row.items()
+                    }
+                )
+            )
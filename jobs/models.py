@@ -0,0 +1,54 @@
+import json
+
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    )
+
+    name = models.CharField('Задача', max_length=200)
+    payload = models.TextField('Аргументы', default='{}')
+    status = models.CharField(
+        'Статус',
+        max_length=10,
+        choices=STATUS_CHOICES,
+        default=QUEUED
+    )
+    attempts = models.PositiveIntegerField('Попыток', default=0)
+    max_attempts = models.PositiveIntegerField('Максимум попыток', default=3)
+    run_after = models.DateTimeField('Не раньше', default=timezone.now)
+    locked_until = models.DateTimeField('Занята до', blank=True, null=True)
+    locked_by = models.CharField('Воркер', max_length=100, blank=True)
+    last_error = models.TextField('Последняя ошибка', blank=True)
+    created = models.DateTimeField('Создана', auto_now_add=True)
+    started = models.DateTimeField('Запущена', blank=True, null=True)
+    finished = models.DateTimeField('Завершена', blank=True, null=True)
+    wait_time = models.FloatField('Ожидание, с', blank=True, null=True)
+    run_time = models.FloatField('Выполнение, с', blank=True, null=True)
+
+    def __str__(self):
+        return f'{self.name} {self.status}'
+
+    @property
+    def args(self):
+        return json.loads(self.payload).get('args', [])
+
+    @property
+    def kwargs(self):
+        return json.loads(self.payload).get('kwargs', {})
+
+    class Meta:
+        ordering = ['run_after']
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
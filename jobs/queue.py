@@ -0,0 +1,130 @@
+import logging
+import time
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job
+from .registry import get_task
+
+logger = logging.getLogger(__name__)
+
+
+def available(now):
+    """Задачи, которые можно взять: новые и те, чей воркер пропал.
+
+    Взятая задача скрыта от других воркеров до `locked_until`; если
+    воркер не успел её завершить, задача снова становится доступной —
+    пока не исчерпаны попытки.
+    """
+    return Q(status=Job.QUEUED, run_after__lte=now) | Q(
+        status=Job.RUNNING, locked_until__lt=now,
+        attempts__lt=F('max_attempts'),
+    )
+
+
+def fail_abandoned(now):
+    """Задачи, воркер которых пропал на последней попытке, — в FAILED.
+
+    Иначе задача, которая роняет воркер (падение процесса, OOM),
+    уронила бы по очереди все воркеры.
+    """
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_until__lt=now,
+        attempts__gte=F('max_attempts'),
+    ).update(
+        status=Job.FAILED,
+        locked_until=None,
+        last_error='Воркер не завершил задачу до locked_until',
+        finished=now,
+    )
+
+
+def claim(worker_id, limit=1):
+    now = timezone.now()
+    fail_abandoned(now)
+    candidates = list(
+        Job.objects.filter(available(now))
+        .order_by('run_after', 'pk')
+        .values_list('pk', flat=True)[:limit * 2]
+    )
+    claimed = []
+    for pk in candidates:
+        if len(claimed) >= limit:
+            break
+        # условная запись: выигрывает только один из конкурирующих воркеров
+        taken = Job.objects.filter(available(now), pk=pk).update(
+            status=Job.RUNNING,
+            locked_by=worker_id,
+            locked_until=now + timedelta(
+                seconds=settings.JOBS_VISIBILITY_TIMEOUT),
+            attempts=F('attempts') + 1,
+            started=now,
+        )
+        if taken:
+            claimed.append(pk)
+    return claimed
+
+
+def retry_delay(attempts):
+    return settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1)
+
+
+def execute(job_id):
+    job = Job.objects.get(pk=job_id)
+    started = time.monotonic()
+    try:
+        get_task(job.name)(*job.args, **job.kwargs)
+    except Exception:
+        run_time = time.monotonic() - started
+        logger.exception('Задача %s (%s) упала', job.name, job.pk)
+        failed = job.attempts >= job.max_attempts
+        Job.objects.filter(pk=job.pk).update(
+            status=Job.FAILED if failed else Job.QUEUED,
+            run_after=timezone.now() + timedelta(
+                seconds=retry_delay(job.attempts)),
+            locked_until=None,
+            last_error=traceback.format_exc(),
+            finished=timezone.now() if failed else None,
+            run_time=run_time,
+        )
+        return False
+    Job.objects.filter(pk=job.pk).update(
+        status=Job.DONE,
+        locked_until=None,
+        finished=timezone.now(),
+        wait_time=(job.started - job.created).total_seconds(),
+        run_time=time.monotonic() - started,
+    )
+    return True
+
+
+def execute_in_pool(job_id):
+    try:
+        return execute(job_id)
+    finally:
+        # у потока или процесса пула свои соединения — закрываем их
+        connections.close_all()
+
+
+def run_pending(worker_id='inline', limit=None):
+    """Выполнить в текущем потоке всё, что готово к запуску."""
+    done = 0
+    while limit is None or done < limit:
+        claimed = claim(worker_id)
+        if not claimed:
+            break
+        execute(claimed[0])
+        done += 1
+    return done
+
+
+def prune(older_than):
+    return Job.objects.filter(
+        status=Job.DONE,
+        finished__lt=timezone.now() - older_than,
+    ).delete()[0]
@@ -0,0 +1,57 @@
+import functools
+import json
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+_tasks = {}
+
+
+class UnknownTask(Exception):
+    pass
+
+
+def task(func=None, *, max_attempts=None):
+    """Зарегистрировать функцию как фоновую задачу.
+
+    Аргументы задачи сохраняются в JSON, поэтому передавать в неё надо
+    идентификаторы, а не объекты моделей. Вызов `func.delay(...)`
+    ставит задачу в очередь; с JOBS_EAGER она выполняется сразу.
+    """
+    if func is None:
+        return functools.partial(task, max_attempts=max_attempts)
+    name = f'{func.__module__}.{func.__qualname__}'
+    _tasks[name] = func
+
+    def delay(*args, **kwargs):
+        return enqueue(name, args, kwargs, max_attempts=max_attempts)
+
+    func.task_name = name
+    func.delay = delay
+    return func
+
+
+def get_task(name):
+    if name not in _tasks:
+        try:
+            import_string(name)
+        except ImportError:
+            pass
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise UnknownTask(name)
+
+
+def enqueue(name, args=(), kwargs=None, max_attempts=None):
+    from .models import Job
+
+    kwargs = kwargs or {}
+    if settings.JOBS_EAGER:
+        get_task(name)(*args, **kwargs)
+        return None
+    return Job.objects.create(
+        name=name,
+        payload=json.dumps({'args': list(args), 'kwargs': kwargs}),
+        max_attempts=max_attempts or settings.JOBS_MAX_ATTEMPTS,
+    )
@@ -0,0 +1,156 @@
+import json
+from email.mime.text import MIMEText
+from datetime import timedelta
+from io import StringIO
+
+from django.core import mail
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from jobs.models import Job
+from jobs.queue import claim, execute, run_pending
+from jobs.registry import enqueue, task
+
+calls = []
+
+
+@task
+def record(value):
+    calls.append(value)
+
+
+@task(max_attempts=2)
+def explode():
+    raise RuntimeError('boom')
+
+
+@override_settings(JOBS_RETRY_DELAY=10)
+class JobQueueTest(TestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_delay_and_run(self):
+        job = record.delay('value')
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(calls, [])
+        self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(calls, ['value'])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNotNone(job.run_time)
+        self.assertIsNotNone(job.wait_time)
+
+    @override_settings(JOBS_EAGER=True)
+    def test_eager(self):
+        self.assertIsNone(record.delay('now'))
+        self.assertEqual(calls, ['now'])
+        self.assertFalse(Job.objects.exists())
+
+    def test_retry_with_backoff_then_fail(self):
+        job = explode.delay()
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            self.assertEqual(run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertIn('boom', job.last_error)
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertEqual(claim('worker'), [])
+
+        Job.objects.update(run_after=timezone.now())
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(run_pending(), 0)
+
+    def test_visibility_timeout(self):
+        job = record.delay('once')
+        self.assertEqual(claim('first'), [job.pk])
+        self.assertEqual(claim('second'), [])
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim('second'), [job.pk])
+        execute(job.pk)
+        job.refresh_from_db()
+        self.assertEqual(job.locked_by, 'second')
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual(calls, ['once'])
+
+    def test_abandoned_job_fails_after_max_attempts(self):
+        # воркер падает вместе с задачей и не успевает записать итог
+        job = explode.delay()
+        for attempt in range(job.max_attempts):
+            self.assertEqual(claim(f'worker{attempt}'), [job.pk])
+            Job.objects.update(
+                locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(claim('next'), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, job.max_attempts)
+        self.assertIsNotNone(job.finished)
+
+    def test_unknown_task_fails(self):
+        enqueue('jobs.tests.missing')
+        Job.objects.update(max_attempts=1)
+        with self.assertLogs('jobs.queue', 'ERROR'):
+            run_pending()
+        self.assertEqual(Job.objects.get().status, Job.FAILED)
+
+
+class JobWorkerCommandTest(TransactionTestCase):
+
+    def setUp(self):
+        calls.clear()
+
+    def test_worker_command(self):
+        record.delay(1)
+        record.delay(2)
+        out = StringIO()
+        call_command('worker', '--once', '--concurrency=1', stdout=out)
+        self.assertEqual(sorted(calls), [1, 2])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 2)
+        call_command('worker', '--stats', stdout=out)
+        self.assertIn('jobs.tests.record: всего 2', out.getvalue())
+
+
+@override_settings(
+    EMAIL_BACKEND='jobs.mail.QueuedEmailBackend',
+    JOBS_EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend',
+)
+class QueuedEmailTest(TestCase):
+
+    def test_mail_sent_by_worker(self):
+        mail.send_mail('Тема', 'Текст', 'from@yatube.ru', ['to@yatube.ru'])
+        self.assertEqual(len(mail.outbox), 0)
+        payload = json.loads(Job.objects.get().payload)
+        self.assertEqual(payload['args'][0]['to'], ['to@yatube.ru'])
+        run_pending()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, 'Тема')
+
+    def test_attachments_and_alternatives_queued(self):
+        message = mail.EmailMultiAlternatives(
+            'Отчёт', 'Текст', 'from@yatube.ru', ['to@yatube.ru'])
+        message.attach_alternative('<p>Текст</p>', 'text/html')
+        message.attach('report.csv', 'a,b\n1,2\n', 'text/csv')
+        message.attach('logo.png', b'\x89PNG\x00\xff', 'image/png')
+        message.send()
+        self.assertEqual(len(mail.outbox), 0)
+        run_pending()
+        sent = mail.outbox[0]
+        self.assertEqual(sent.alternatives, [('<p>Текст</p>', 'text/html')])
+        self.assertEqual(sent.attachments, [
+            ('report.csv', 'a,b\n1,2\n', 'text/csv'),
+            ('logo.png', b'\x89PNG\x00\xff', 'image/png'),
+        ])
+
+    def test_mime_attachment_sent_immediately(self):
+        message = mail.EmailMessage(
+            'Тема', 'Текст', 'from@yatube.ru', ['to@yatube.ru'])
+        message.attach(MIMEText('вложение'))
+        message.send()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(Job.objects.exists())
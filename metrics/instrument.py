@@ -0,0 +1,104 @@
+"""Сбор показателей текущего запроса.
+
+Шаблоны и кэши оборачиваются один раз при старте. Обёртки ничего не
+делают, пока в потоке нет активного Sample, и учитывают только внешний
+вызов: вложенный include или обращение TieredCache к общему уровню не
+считаются дважды.
+"""
+import threading
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.template.base import Template
+from django.utils.module_loading import import_string
+
+_state = threading.local()
+_MISSING = object()
+
+
+class Sample:
+
+    def __init__(self):
+        self.duration = 0
+        self.queries = 0
+        self.db_time = 0
+        self.template_time = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        # execute_wrapper соединения
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.queries += 1
+
+
+def current():
+    return getattr(_state, 'sample', None)
+
+
+def start():
+    _state.sample = Sample()
+    _state.depth = 0
+    return _state.sample
+
+
+def stop():
+    _state.sample = None
+
+
+def _outermost(func, measure):
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        sample = current()
+        if sample is None or _state.depth:
+            return func(*args, **kwargs)
+        _state.depth += 1
+        try:
+            return measure(sample, func, *args, **kwargs)
+        finally:
+            _state.depth -= 1
+    wrapper._metrics_wrapped = True
+    return wrapper
+
+
+def _timed_render(sample, render, *args, **kwargs):
+    started = time.perf_counter()
+    try:
+        return render(*args, **kwargs)
+    finally:
+        sample.template_time += time.perf_counter() - started
+
+
+def _counted_get(sample, get, cache, key, default=None, version=None):
+    value = get(cache, key, _MISSING, version=version)
+    if value is _MISSING:
+        sample.cache_misses += 1
+        return default
+    sample.cache_hits += 1
+    return value
+
+
+def _counted_get_many(sample, get_many, cache, keys, version=None):
+    keys = list(keys)
+    found = get_many(cache, keys, version=version)
+    sample.cache_hits += len(found)
+    sample.cache_misses += len(keys) - len(found)
+    return found
+
+
+def install():
+    if not settings.METRICS_ENABLED:
+        return
+    if not getattr(Template.render, '_metrics_wrapped', False):
+        Template.render = _outermost(Template.render, _timed_render)
+    for params in settings.CACHES.values():
+        backend = import_string(params['BACKEND'])
+        if not getattr(backend.get, '_metrics_wrapped', False):
+            backend.get = _outermost(backend.get, _counted_get)
+            backend.get_many = _outermost(
+                backend.get_many, _counted_get_many)
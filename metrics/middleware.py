@@ -0,0 +1,48 @@
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import instrument
+from .registry import registry
+
+logger = logging.getLogger('yatube.metrics')
+
+
+class MetricsMiddleware:
+    """Число и время SQL-запросов, время рендеринга шаблонов и попадания
+    в кэш для каждого запроса, сгруппированные по имени URL.
+
+    Превышение QUERY_BUDGETS[имя URL] пишется в лог как предупреждение.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not settings.METRICS_ENABLED or instrument.current() is not None:
+            return self.get_response(request)
+        sample = instrument.start()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(sample))
+                response = self.get_response(request)
+        finally:
+            instrument.stop()
+        sample.duration = time.perf_counter() - started
+
+        match = request.resolver_match
+        view = match.view_name if match else '<unresolved>'
+        budget = settings.QUERY_BUDGETS.get(view)
+        over_budget = budget is not None and sample.queries > budget
+        if over_budget:
+            logger.warning(
+                'Превышен бюджет запросов %s: %d > %d (%s)',
+                view, sample.queries, budget, request.path
+            )
+        registry.record(view, sample, over_budget)
+        return response
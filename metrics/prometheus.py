@@ -0,0 +1,51 @@
+"""Текстовый формат экспозиции Prometheus 0.0.4."""
+from .registry import INF
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+HISTOGRAMS = (
+    ('duration', 'yatube_request_duration_seconds',
+     'Время обработки запроса.'),
+    ('queries', 'yatube_request_queries', 'SQL-запросов на запрос.'),
+    ('db_time', 'yatube_request_db_seconds', 'Время в SQL-запросах.'),
+    ('template_time', 'yatube_request_template_seconds',
+     'Время рендеринга шаблонов.'),
+)
+COUNTERS = (
+    ('cache_hits', 'yatube_cache_hits_total', 'Попадания в кэш.'),
+    ('cache_misses', 'yatube_cache_misses_total', 'Промахи кэша.'),
+    ('budget_violations', 'yatube_query_budget_violations_total',
+     'Запросы сверх бюджета SQL-запросов.'),
+)
+
+
+def _label(value):
+    return value.replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+def _number(value):
+    return '+Inf' if value == INF else repr(float(value))
+
+
+def render(views):
+    lines = []
+    for attribute, name, help_text in HISTOGRAMS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for view, stats in views:
+            histogram = getattr(stats, attribute)
+            label = _label(view)
+            for bound, count in histogram.cumulative():
+                lines.append(
+                    f'{name}_bucket{{view="{label}",le="{_number(bound)}"}} '
+                    f'{count}'
+                )
+            lines.append(f'{name}_sum{{view="{label}"}} {histogram.sum!r}')
+            lines.append(f'{name}_count{{view="{label}"}} {histogram.count}')
+    for attribute, name, help_text in COUNTERS:
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for view, stats in views:
+            lines.append(
+                f'{name}{{view="{_label(view)}"}} {getattr(stats, attribute)}')
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,115 @@
+"""Агрегаты метрик запросов по именам URL.
+
+Данные живут в памяти процесса: каждый воркер отдаёт свои, как принято
+для Prometheus, который собирает их со всех процессов сам.
+"""
+import bisect
+import threading
+
+INF = float('inf')
+SECONDS_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, INF
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, INF)
+
+
+class Histogram:
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        total = 0
+        for bound, count in zip(self.buckets, self.counts):
+            total += count
+            yield bound, total
+
+    def quantile(self, q):
+        """Оценка квантиля линейной интерполяцией внутри корзины."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        lower = 0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            if seen + count >= rank and count:
+                if bound == INF:
+                    return lower
+                return lower + (bound - lower) * (rank - seen) / count
+            seen += count
+            lower = bound
+        return lower
+
+
+class ViewStats:
+
+    def __init__(self):
+        self.duration = Histogram(SECONDS_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.db_time = Histogram(SECONDS_BUCKETS)
+        self.template_time = Histogram(SECONDS_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.budget_violations = 0
+
+    def as_dict(self):
+        def summary(histogram):
+            return {
+                'count': histogram.count,
+                'sum': histogram.sum,
+                'p50': histogram.quantile(0.5),
+                'p95': histogram.quantile(0.95),
+                'p99': histogram.quantile(0.99),
+            }
+        return {
+            'requests': self.duration.count,
+            'duration': summary(self.duration),
+            'queries': summary(self.queries),
+            'db_time': summary(self.db_time),
+            'template_time': summary(self.template_time),
+            'cache_hits': self.cache_hits,
+            'cache_misses': self.cache_misses,
+            'budget_violations': self.budget_violations,
+        }
+
+
+class Registry:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, sample, over_budget=False):
+        with self._lock:
+            stats = self._views.get(view)
+            if stats is None:
+                stats = self._views[view] = ViewStats()
+            stats.duration.observe(sample.duration)
+            stats.queries.observe(sample.queries)
+            stats.db_time.observe(sample.db_time)
+            stats.template_time.observe(sample.template_time)
+            stats.cache_hits += sample.cache_hits
+            stats.cache_misses += sample.cache_misses
+            stats.budget_violations += over_budget
+
+    def views(self):
+        with self._lock:
+            return sorted(self._views.items())
+
+    def snapshot(self):
+        return {view: stats.as_dict() for view, stats in self.views()}
+
+    def reset(self):
+        with self._lock:
+            self._views.clear()
+
+
+registry = Registry()
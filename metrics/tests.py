@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from metrics.registry import Histogram, registry
+from posts.models import Post
+
+User = get_user_model()
+
+
+class MetricsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        registry.reset()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        Post.objects.create(text='post', author=self.user)
+
+    def test_request_recorded_per_view(self):
+        self.client.get(reverse('index'))
+        self.client.get(reverse('index'))
+        stats = dict(registry.views())['index']
+        self.assertEqual(stats.duration.count, 2)
+        self.assertGreater(stats.queries.sum, 0)
+        self.assertGreater(stats.db_time.sum, 0)
+        self.assertGreater(stats.template_time.sum, 0)
+        self.assertGreater(stats.cache_hits, 0)
+        self.assertGreater(stats.cache_misses, 0)
+
+    @override_settings(QUERY_BUDGETS={'index': 0})
+    def test_budget_violation_logged(self):
+        with self.assertLogs('yatube.metrics', 'WARNING') as logs:
+            self.client.get(reverse('index'))
+        self.assertIn('index', logs.output[0])
+        self.assertEqual(dict(registry.views())['index'].budget_violations, 1)
+
+    def test_report_for_staff_only(self):
+        self.client.get(reverse('index'))
+        response = self.client.get(reverse('metrics_report'))
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(reverse('metrics_prometheus'))
+        self.assertEqual(response.status_code, 302)
+
+        User.objects.create_superuser(
+            'admin', 'admin@skynet.com', 'qwerty123')
+        self.client.login(username='admin', password='qwerty123')
+        report = self.client.get(reverse('metrics_report')).json()
+        self.assertEqual(report['index']['requests'], 1)
+        self.assertIn('p95', report['index']['duration'])
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_prometheus_with_token(self):
+        self.client.get(reverse('index'))
+        response = self.client.get(
+            reverse('metrics_prometheus'), HTTP_AUTHORIZATION='Bearer nope')
+        self.assertEqual(response.status_code, 302)
+        response = self.client.get(
+            reverse('metrics_prometheus'), HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE yatube_request_duration_seconds histogram', body)
+        self.assertIn(
+            'yatube_request_duration_seconds_bucket{view="index",le="+Inf"} 1',
+            body
+        )
+        self.assertIn('yatube_request_queries_count{view="index"} 1', body)
+
+
+class HistogramTest(TestCase):
+
+    def test_quantiles(self):
+        histogram = Histogram((1, 2, 5, float('inf')))
+        for value in (0.5, 1.5, 1.5, 4):
+            histogram.observe(value)
+        self.assertEqual(histogram.count, 4)
+        self.assertEqual(list(histogram.cumulative())[-1][1], 4)
+        self.assertEqual(histogram.quantile(0.5), 1.5)
+        self.assertLessEqual(histogram.quantile(0.99), 5)
+        self.assertIsNone(Histogram((1,)).quantile(0.5))
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+
+urlpatterns = [
+    path('', views.report, name='metrics_report'),
+    path('prometheus/', views.prometheus_metrics, name='metrics_prometheus'),
+]
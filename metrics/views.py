@@ -0,0 +1,33 @@
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
+from django.views.decorators.cache import never_cache
+
+from . import prometheus
+from .registry import registry
+
+
+@never_cache
+@staff_member_required
+def report(request):
+    return JsonResponse(registry.snapshot(), json_dumps_params={'indent': 2})
+
+
+@never_cache
+def prometheus_metrics(request):
+    """Доступно персоналу или сборщику с токеном METRICS_TOKEN."""
+    token = settings.METRICS_TOKEN
+    header = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = bool(token) and constant_time_compare(
+        header, f'Bearer {token}')
+    if not authorized:
+        return staff_member_required(_prometheus)(request)
+    return _prometheus(request)
+
+
+def _prometheus(request):
+    return HttpResponse(
+        prometheus.render(registry.views()),
+        content_type=prometheus.CONTENT_TYPE
+    )
@@ -1,22 +1,45 @@
 from django.contrib import admin
+
+from search import index as search_index
+from search.models import IndexedTerm
+
+from . import images
 from .models import Post, Group, Comment
 
 
-class PostAdmin(admin.ModelAdmin):
+class IndexedSearchMixin:
+    """Поиск в админке через полнотекстовый индекс вместо LIKE."""
+    search_doc_type = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term:
+            return queryset, False
+        ids = search_index.search_ids(search_term, self.search_doc_type)
+        return queryset.filter(pk__in=ids), False
+
+
+class PostAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     search_fields = ('text',)
+    search_doc_type = IndexedTerm.POST
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
 
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if 'image' in form.changed_data:
+            images.schedule_processing(obj)
+
 
 class GroupAdmin(admin.ModelAdmin):
     pass
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(IndexedSearchMixin, admin.ModelAdmin):
     list_display = ('author', 'post', 'created')
     list_filter = ('created',)
     search_fields = ('text',)
+    search_doc_type = IndexedTerm.COMMENT
     empty_value_display = '-пусто-'
 
 
@@ -0,0 +1,146 @@
+"""BlurHash (https://blurha.sh) без внешних зависимостей.
+
+Хэш в пару десятков символов описывает размытое превью картинки: клиент
+рисует его, пока грузится сама картинка. Считается по уменьшенной копии,
+поэтому стоимость не зависит от размера исходника.
+"""
+import math
+
+from PIL import Image
+
+ALPHABET = (
+    '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+    'abcdefghijklmnopqrstuvwxyz#$%*+,-.:;=?@[]^_{|}~'
+)
+SAMPLE_SIZE = (32, 32)
+
+
+def encode83(value, length):
+    return ''.join(
+        ALPHABET[value // 83 ** (length - position) % 83]
+        for position in range(1, length + 1)
+    )
+
+
+def decode83(value):
+    result = 0
+    for char in value:
+        result = result * 83 + ALPHABET.index(char)
+    return result
+
+
+def srgb_to_linear(value):
+    value /= 255
+    if value <= 0.04045:
+        return value / 12.92
+    return ((value + 0.055) / 1.055) ** 2.4
+
+
+def linear_to_srgb(value):
+    value = max(0.0, min(1.0, value))
+    if value <= 0.0031308:
+        return int(value * 12.92 * 255 + 0.5)
+    return int((1.055 * value ** (1 / 2.4) - 0.055) * 255 + 0.5)
+
+
+def sign_pow(value, exponent):
+    return math.copysign(abs(value) ** exponent, value)
+
+
+def encode(image, x_components=4, y_components=3):
+    """BlurHash картинки Pillow с x_components × y_components гармоник."""
+    sample = image.convert('RGB')
+    sample.thumbnail(SAMPLE_SIZE)
+    width, height = sample.size
+    pixels = [
+        tuple(srgb_to_linear(channel) for channel in pixel)
+        for pixel in sample.getdata()
+    ]
+
+    factors = []
+    for j in range(y_components):
+        rows = [math.cos(math.pi * j * y / height) for y in range(height)]
+        for i in range(x_components):
+            columns = [math.cos(math.pi * i * x / width)
+                       for x in range(width)]
+            normalisation = 1 if i == 0 and j == 0 else 2
+            red = green = blue = 0.0
+            for y in range(height):
+                for x in range(width):
+                    basis = columns[x] * rows[y]
+                    pixel = pixels[y * width + x]
+                    red += basis * pixel[0]
+                    green += basis * pixel[1]
+                    blue += basis * pixel[2]
+            scale = normalisation / (width * height)
+            factors.append((red * scale, green * scale, blue * scale))
+
+    dc, ac = factors[0], factors[1:]
+    blurhash = encode83((x_components - 1) + (y_components - 1) * 9, 1)
+    if ac:
+        actual_max = max(abs(value) for factor in ac for value in factor)
+        quantised_max = max(0, min(82, int(actual_max * 166 - 0.5)))
+        max_value = (quantised_max + 1) / 166
+        blurhash += encode83(quantised_max, 1)
+    else:
+        max_value = 1
+        blurhash += encode83(0, 1)
+
+    blurhash += encode83(
+        (linear_to_srgb(dc[0]) << 16)
+        + (linear_to_srgb(dc[1]) << 8)
+        + linear_to_srgb(dc[2]),
+        4
+    )
+    for factor in ac:
+        red, green, blue = (
+            max(0, min(18, int(sign_pow(value / max_value, 0.5) * 9 + 9.5)))
+            for value in factor
+        )
+        blurhash += encode83(red * 19 * 19 + green * 19 + blue, 2)
+    return blurhash
+
+
+def decode(blurhash, width, height):
+    """Картинка Pillow width × height, восстановленная по BlurHash."""
+    y_components, x_components = divmod(decode83(blurhash[0]), 9)
+    x_components += 1
+    y_components += 1
+    if len(blurhash) != 4 + 2 * x_components * y_components:
+        raise ValueError(f'Некорректный BlurHash: {blurhash}')
+    max_value = (decode83(blurhash[1]) + 1) / 166
+
+    dc = decode83(blurhash[2:6])
+    colours = [tuple(
+        srgb_to_linear(channel)
+        for channel in (dc >> 16, dc >> 8 & 255, dc & 255)
+    )]
+    for position in range(6, len(blurhash), 2):
+        value = decode83(blurhash[position:position + 2])
+        colours.append(tuple(
+            sign_pow((quantised - 9) / 9, 2) * max_value
+            for quantised in (value // (19 * 19), value // 19 % 19, value % 19)
+        ))
+
+    pixels = []
+    for y in range(height):
+        rows = [math.cos(math.pi * j * y / height)
+                for j in range(y_components)]
+        for x in range(width):
+            columns = [math.cos(math.pi * i * x / width)
+                       for i in range(x_components)]
+            red = green = blue = 0.0
+            for j in range(y_components):
+                for i in range(x_components):
+                    basis = columns[i] * rows[j]
+                    colour = colours[j * x_components + i]
+                    red += basis * colour[0]
+                    green += basis * colour[1]
+                    blue += basis * colour[2]
+            pixels.append((
+                linear_to_srgb(red), linear_to_srgb(green),
+                linear_to_srgb(blue)
+            ))
+    image = Image.new('RGB', (width, height))
+    image.putdata(pixels)
+    return image
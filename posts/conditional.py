@@ -0,0 +1,66 @@
+"""Валидаторы для условных GET-запросов HTML-страниц.
+
+ETag страницы собирается из состояния базы: идентификаторов и версий
+записей на странице (версия растёт с каждой правкой и комментарием),
+курсора страницы и зрителя — от него зависят шапка, ссылка
+«Редактировать» и кнопка подписки. Поколения feed_cache для этого не
+годятся: при кэше в памяти процесса другие воркеры их не видят. Поэтому
+неизменившуюся страницу можно отдать ответом 304, не читая записи целиком
+и не рендеря шаблоны.
+"""
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+
+from yatube.db.routers import use_primary
+
+from . import feed_cache
+from .paginator import CursorPaginator
+
+
+def feed_state(paginator, request):
+    """Состояние страницы ленты одним запросом по индексу ленты:
+    без join'ов, только ключ сортировки и версия записей.
+
+    Читается с основной базы, как и сами страницы в feed_cache: иначе
+    ETag от отстающей реплики закрепит у клиента устаревшую страницу.
+    """
+    light = CursorPaginator(
+        # автор и группа нужны менеджерам связей (group.posts,
+        # author.posts), иначе каждая запись догружается отдельно
+        paginator.queryset.select_related(None).only(
+            *paginator.fields, 'version', 'author', 'group'),
+        paginator.per_page,
+        paginator.ordering,
+    )
+    with use_primary():
+        return feed_cache.page_state(light.get_page(request))
+
+
+def page_etag(request, *parts):
+    raw = json.dumps(
+        [
+            request.user.pk,
+            request.GET.get('after'),
+            request.GET.get('before'),
+            parts,
+        ],
+        separators=(',', ':'),
+        default=str,
+    )
+    # слабый: в формах каждый раз новая маска CSRF-токена
+    return 'W/"{}"'.format(hashlib.md5(raw.encode()).hexdigest())
+
+
+def not_modified(request, etag):
+    response = get_conditional_response(request, etag=etag)
+    if response is not None:
+        return with_etag(response, etag)
+    return None
+
+
+def with_etag(response, etag):
+    response['ETag'] = etag
+    patch_vary_headers(response, ('Cookie',))
+    return response
@@ -0,0 +1,122 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from yatube.db.routers import use_primary
+
+GLOBAL_SCOPE = 'all'
+
+
+def generation_key(scope):
+    return f'feed:gen:{scope}'
+
+
+def generations(*scopes):
+    """Текущие поколения областей ленты одним запросом к кэшу."""
+    keys = [generation_key(scope) for scope in scopes + (GLOBAL_SCOPE,)]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    for key in missing:
+        # Новое поколение не должно совпасть с вытесненным старым.
+        cache.add(key, time.time_ns(), None)
+    if missing:
+        values.update(cache.get_many(missing))
+    return tuple(values.get(key) for key in keys)
+
+
+def _bump(scopes):
+    for scope in scopes:
+        key = generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, time.time_ns(), None)
+
+
+def bump(*scopes):
+    """Инвалидировать закэшированные страницы указанных областей.
+
+    Поколение поднимается сразу и ещё раз после коммита: иначе запрос,
+    успевший прочитать незакоммиченное состояние, закэширует его под
+    новым поколением.
+    """
+    scopes = [scope for scope in scopes if scope is not None]
+    _bump(scopes)
+    transaction.on_commit(lambda: _bump(scopes))
+
+
+def group_scope(group_id):
+    return f'group:{group_id}' if group_id else None
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def page_key(scope, request):
+    cursor = '{}:{}'.format(
+        request.GET.get('after', ''), request.GET.get('before', '')
+    )
+    return 'feed:page:{}:{}'.format(
+        scope, hashlib.md5(cursor.encode()).hexdigest()
+    )
+
+
+def page_state(page):
+    """Записи страницы как пары (id, версия) и есть ли следующая."""
+    return [[post.pk, post.version] for post in page], page.has_next()
+
+
+def get_page(scope, paginator, request, state=None):
+    """Страница ленты из кэша с отдачей устаревшей копии на время
+    перестроения (stale-while-revalidate).
+
+    Перестраивает страницу только один запрос — тот, кто первым взял
+    блокировку; остальные отдают устаревшую копию или недолго ждут.
+    Если передано состояние из базы (page_state), копия, которая с ним
+    расходится, не отдаётся вовсе: поколения других процессов могут
+    быть не видны.
+    """
+    def matches(page):
+        return state is None or page_state(page) == state
+
+    key = page_key(scope, request)
+    generation = generations(scope)
+    entry = cache.get(key)
+    if entry is not None:
+        entry_generation, fresh_until, page = entry
+        if (entry_generation == generation and fresh_until > time.time()
+                and matches(page)):
+            return page
+
+    lock_key = f'{key}:lock'
+    if cache.add(lock_key, 1, settings.FEED_CACHE_LOCK_TIMEOUT):
+        try:
+            # страница уходит в общий кэш под текущим поколением, поэтому
+            # собирается с основной базы, а не с отстающей реплики
+            with use_primary():
+                page = paginator.get_page(request)
+            cache.set(
+                key,
+                (generation, time.time() + settings.FEED_CACHE_TTL, page),
+                settings.FEED_CACHE_STALE_TTL,
+            )
+            return page
+        finally:
+            cache.delete(lock_key)
+
+    if entry is not None and matches(entry[2]):
+        return entry[2]
+
+    deadline = time.monotonic() + settings.FEED_CACHE_LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if (entry is not None and entry[0] == generation
+                and matches(entry[2])):
+            return entry[2]
+    with use_primary():
+        return paginator.get_page(request)
@@ -1,5 +1,6 @@
 from django import forms
 from django.utils.translation import gettext_lazy as _
+from posts.images import check_dimensions
 from posts.models import Post, Comment
 
 
@@ -18,6 +19,26 @@ class PostForm(forms.ModelForm):
             'image': _('Поделитесь фотографиями'),
         }
 
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # ImageField уже открыл файл, но прочитал только заголовок
+        if image and hasattr(image, 'image'):
+            check_dimensions(image.image)
+        return image
+
+    def save(self, commit=True):
+        post = super().save(commit=False)
+        if 'image' in self.changed_data:
+            # всё, что построено по старой картинке, больше не годится;
+            # новую обработает фоновый воркер
+            post.thumbnail = None
+            post.thumbnail_variants = ''
+            post.image_width = post.image_height = None
+            post.image_blurhash = ''
+        if commit:
+            post.save()
+        return post
+
 
 class CommentForm(forms.ModelForm):
     text = forms.CharField(widget=forms.Textarea)
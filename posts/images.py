@@ -0,0 +1,201 @@
+"""Обработка загруженных картинок.
+
+Запрос только проверяет размеры по заголовку файла и сохраняет загрузку
+как есть. Декодирует её фоновый воркер: поворачивает по EXIF, уменьшает
+до IMAGE_MAX_SIDE, перекодирует в IMAGE_FORMAT без метаданных, строит
+миниатюры для лент и BlurHash, а ширину и высоту записывает в Post.
+Лентам после этого не нужно ни открывать, ни декодировать картинки.
+
+Файлы хранятся по содержимому (posts.storage), так что повторно
+загруженная картинка не обрабатывается заново: запись получает ссылки на
+файлы, уже построенные для другой записи.
+"""
+import base64
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.db.models import Q
+from PIL import Image, ImageOps
+
+from jobs.registry import task
+
+from . import blurhash
+from .models import Post, StoredFile
+
+THUMBNAIL_SIZE = (960, 339)
+THUMBNAIL_QUALITY = 85
+# варианты миниатюры для srcset; крупнее картинки только THUMBNAIL_SIZE,
+# его JPEG остаётся в Post.thumbnail для браузеров без srcset
+THUMBNAIL_WIDTHS = (320, 640, 960, 1920)
+THUMBNAIL_FORMATS = ('WEBP', 'JPEG')
+PLACEHOLDER_WIDTH = 16
+EXTENSIONS = {'WEBP': 'webp', 'JPEG': 'jpg'}
+
+
+def check_dimensions(image):
+    """Отклонить картинку по размерам из заголовка, не декодируя её."""
+    width, height = image.size
+    if width * height > settings.IMAGE_UPLOAD_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка %(width)s×%(height)s слишком большая: не больше '
+            '%(limit)s мегапикселей.',
+            code='image_too_large',
+            params={
+                'width': width,
+                'height': height,
+                'limit': settings.IMAGE_UPLOAD_MAX_PIXELS // 1000000,
+            },
+        )
+
+
+def encode(image, image_format, quality):
+    content = ContentFile(b'')
+    # метаданные не переносятся: exif и icc_profile не передаём
+    if image_format == 'WEBP':
+        image.save(content, 'WEBP', quality=quality, method=4)
+    else:
+        image.save(content, 'JPEG', quality=quality, optimize=True,
+                   progressive=True)
+    return content
+
+
+def render_thumbnails(image):
+    """Варианты миниатюры: [(ширина, формат, содержимое)]."""
+    width, height = THUMBNAIL_SIZE
+    widths = [
+        variant for variant in THUMBNAIL_WIDTHS
+        if variant <= image.width or variant == width
+    ]
+    # кадрируем один раз по самому широкому варианту, остальные уменьшаем
+    largest = ImageOps.fit(
+        image, (widths[-1], round(widths[-1] * height / width)),
+        Image.LANCZOS, centering=(0.5, 0.5))
+    thumbnails = []
+    for variant in widths:
+        size = (variant, round(variant * height / width))
+        thumbnail = largest.resize(size, Image.LANCZOS)
+        for image_format in THUMBNAIL_FORMATS:
+            thumbnails.append((
+                variant, image_format,
+                encode(thumbnail, image_format, THUMBNAIL_QUALITY)
+            ))
+    return thumbnails
+
+
+def placeholder(post):
+    """Размытое превью картинки из BlurHash как data: URI."""
+    if not post.image_blurhash or not post.image_width:
+        return ''
+    height = max(1, round(
+        PLACEHOLDER_WIDTH * post.image_height / post.image_width))
+    image = blurhash.decode(post.image_blurhash, PLACEHOLDER_WIDTH, height)
+    content = BytesIO()
+    image.save(content, 'PNG')
+    return 'data:image/png;base64,' + base64.b64encode(
+        content.getvalue()).decode()
+
+
+def process(image_file):
+    """Декодировать загрузку один раз и получить всё, что нужно лентам."""
+    max_side = settings.IMAGE_MAX_SIDE
+    with Image.open(image_file) as source:
+        check_dimensions(source)
+        # JPEG декодируется сразу в уменьшенном в 2–8 раз виде
+        source.draft('RGB', (max_side, max_side))
+        image = ImageOps.exif_transpose(source).convert('RGB')
+    image.thumbnail((max_side, max_side), Image.LANCZOS)
+    return {
+        'image': encode(image, settings.IMAGE_FORMAT, settings.IMAGE_QUALITY),
+        'thumbnails': render_thumbnails(image),
+        'width': image.width,
+        'height': image.height,
+        'blurhash': blurhash.encode(image),
+    }
+
+
+def find_processed(post_id, original):
+    """Другая запись, картинка которой получена из того же файла."""
+    derived = StoredFile.objects.filter(source=original).values('name')
+    return Post.objects.filter(
+        # перезагрузили уже обработанный файл — тоже подходит
+        Q(image__in=derived) | Q(image=original),
+        image__endswith='.' + EXTENSIONS[settings.IMAGE_FORMAT],
+        image_width__isnull=False,
+        thumbnail_variants__gt='',
+    ).exclude(pk=post_id).first()
+
+
+def reuse_processed(post, original):
+    done = find_processed(post.pk, original)
+    storage = post.image.storage
+    if done is None or not hasattr(storage, 'acquire'):
+        return False
+    # перезагруженный обработанный файл уже держит ссылка самой записи
+    if not storage.acquire(*done.files - {original}):
+        return False
+    post.image.name = done.image.name
+    post.thumbnail.name = done.thumbnail.name
+    post.thumbnail_variants = done.thumbnail_variants
+    post.image_width = done.image_width
+    post.image_height = done.image_height
+    post.image_blurhash = done.image_blurhash
+    return True
+
+
+def process_new(post, original):
+    with post.image.open('rb') as image_file:
+        result = process(image_file)
+    base = os.path.splitext(os.path.basename(original))[0]
+    extension = EXTENSIONS[settings.IMAGE_FORMAT]
+    post.image.save(f'{base}.{extension}', result['image'], save=False)
+    variants = []
+    for width, image_format, content in result['thumbnails']:
+        post.thumbnail.save(
+            f'{base}_{width}w.{EXTENSIONS[image_format]}', content,
+            save=False)
+        variants.append(f'{post.thumbnail.name} {width}w')
+        if (width, image_format) == (THUMBNAIL_SIZE[0], 'JPEG'):
+            thumbnail = post.thumbnail.name
+    post.thumbnail.name = thumbnail
+    post.thumbnail_variants = ', '.join(variants)
+    post.image_width = result['width']
+    post.image_height = result['height']
+    post.image_blurhash = result['blurhash']
+    StoredFile.objects.filter(pk__in=post.files).update(source=original)
+
+
+@task
+def process_image(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is None or not post.image:
+        return
+    original = post.image.name
+    if not reuse_processed(post, original):
+        process_new(post, original)
+    with transaction.atomic():
+        # картинку могли заменить, пока мы её обрабатывали
+        if Post.objects.filter(pk=post_id, image=original).exists():
+            # исходный файл освободит сигнал release_replaced_files
+            post.save(update_fields=[
+                'image', 'thumbnail', 'thumbnail_variants', 'image_width',
+                'image_height', 'image_blurhash', 'version'
+            ])
+            return
+    for name in post.files - {original}:
+        post.image.storage.delete(name)
+
+
+@task
+def generate_thumbnail(post_id):
+    # задачи, поставленные до появления process_image
+    process_image(post_id)
+
+
+def schedule_processing(post):
+    # задача пишется в ту же транзакцию, что и запись
+    if post.image:
+        process_image.delay(post.pk)
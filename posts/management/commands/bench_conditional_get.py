@@ -0,0 +1,67 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Сравнивает полный ответ и ответ 304 для лент и страницы записи '
+        'через весь стек middleware'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument(
+            '--user', help='Смотреть страницы от имени этого пользователя')
+
+    def handle(self, *args, **options):
+        post = Post.objects.select_related('author', 'group').first()
+        if post is None:
+            raise CommandError('В базе нет записей — сначала заполните её.')
+        client = Client()
+        if options['user']:
+            client.force_login(User.objects.get(username=options['user']))
+        urls = [
+            reverse('index'),
+            reverse('profile', args=[post.author.username]),
+            reverse('post', args=[post.author.username, post.pk]),
+        ]
+        if post.group_id:
+            urls.append(reverse('group_posts', args=[post.group.slug]))
+
+        self.stdout.write(
+            f'{"страница":<40} {"200, мс":>9} {"304, мс":>9} '
+            f'{"запросов":>9} {"ускорение":>10}'
+        )
+        for url in urls:
+            full, full_queries, etag = self.measure(client, url, options)
+            cached, cached_queries, _ = self.measure(
+                client, url, options, HTTP_IF_NONE_MATCH=etag)
+            self.stdout.write(
+                f'{url:<40} {full:>9.2f} {cached:>9.2f} '
+                f'{full_queries:>4}→{cached_queries:<4} '
+                f'{full / cached:>9.1f}x'
+            )
+
+    def measure(self, client, url, options, **headers):
+        response = client.get(url, **headers)
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url, **headers)
+        started = time.perf_counter()
+        for _ in range(options['requests']):
+            response = client.get(url, **headers)
+        elapsed = time.perf_counter() - started
+        return (
+            elapsed * 1000 / options['requests'],
+            len(queries),
+            response.get('ETag'),
+        )
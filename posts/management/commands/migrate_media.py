@@ -0,0 +1,56 @@
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F
+
+from posts import feed_cache
+from posts.models import Post, StoredFile
+from posts.storage import ContentAddressedStorage
+
+FIELDS = ('image', 'thumbnail')
+
+
+class Command(BaseCommand):
+    help = (
+        'Переносит картинки записей, загруженные до хранилища с адресацией '
+        'по содержимому, под имена по хэшу и объединяет одинаковые'
+    )
+
+    def handle(self, *args, **options):
+        if not isinstance(default_storage, ContentAddressedStorage):
+            raise CommandError(
+                'DEFAULT_FILE_STORAGE должен быть '
+                'posts.storage.ContentAddressedStorage')
+        moved, missing, names = 0, 0, set()
+        for field in FIELDS:
+            legacy = (
+                Post.objects.exclude(**{field: ''}).exclude(**{field: None})
+                .exclude(**{f'{field}__in': StoredFile.objects.values('pk')})
+                .order_by(field).values_list(field, flat=True).distinct()
+            )
+            for name in legacy:
+                if not default_storage.exists(name):
+                    missing += 1
+                    continue
+                names.add(self.migrate(field, name))
+                moved += 1
+        if moved:
+            # в закэшированных карточках и лентах остались старые адреса
+            feed_cache.bump(feed_cache.GLOBAL_SCOPE)
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено файлов: {moved}, различных: {len(names)}, '
+            f'не найдено: {missing}'
+        ))
+
+    def migrate(self, field, name):
+        with transaction.atomic():
+            with default_storage.open(name) as content:
+                # save() уже добавил одну ссылку
+                new_name = default_storage.save(name, content)
+            references = Post.objects.filter(**{field: name}).update(
+                **{field: new_name}, version=F('version') + 1)
+            StoredFile.objects.filter(pk=new_name).update(
+                reference_count=F('reference_count') + references - 1)
+        if new_name != name:
+            default_storage.delete(name)
+        return new_name
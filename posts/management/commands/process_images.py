@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts.images import process_image
+from posts.models import Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Ставит в очередь обработку картинок записей, у которых ещё нет '
+        'размеров, BlurHash или вариантов миниатюры'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--inline', action='store_true',
+            help='Обработать сразу в этом процессе, без воркера')
+
+    def handle(self, *args, **options):
+        post_ids = list(
+            Post.objects.exclude(image='').exclude(image=None)
+            .filter(Q(image_width=None) | Q(thumbnail_variants=''))
+            .order_by('pk')
+            .values_list('pk', flat=True)
+        )
+        for post_id in post_ids:
+            if options['inline']:
+                process_image(post_id)
+            else:
+                process_image.delay(post_id)
+        self.stdout.write(self.style.SUCCESS(
+            f'Картинок к обработке: {len(post_ids)}'
+        ))
@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def grouped_counts(queryset, field):
+    return dict(
+        queryset.order_by()
+        .values_list(field)
+        .annotate(total=Count('pk'))
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики записей, подписок и комментариев с нуля'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int,
+            help='По умолчанию — наибольшая пачка, допустимая для СУБД')
+
+    def handle(self, *args, **options):
+        posts = grouped_counts(Post.objects.all(), 'author')
+        followers = grouped_counts(Follow.objects.all(), 'author')
+        following = grouped_counts(Follow.objects.all(), 'user')
+        comments = grouped_counts(Comment.objects.all(), 'author')
+        with transaction.atomic():
+            UserStats.objects.all().delete()
+            UserStats.objects.bulk_create(
+                (
+                    UserStats(
+                        user_id=user_id,
+                        posts_count=posts.get(user_id, 0),
+                        followers_count=followers.get(user_id, 0),
+                        following_count=following.get(user_id, 0),
+                        comments_count=comments.get(user_id, 0),
+                    )
+                    for user_id in User.objects.values_list('pk', flat=True)
+                    .iterator()
+                ),
+                batch_size=options['batch_size'],
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Счётчики пересчитаны: {UserStats.objects.count()}'
+        ))
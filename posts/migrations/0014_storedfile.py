@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_dimensions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False, verbose_name='Имя')),
+                ('reference_count', models.PositiveIntegerField(default=0, verbose_name='Ссылок')),
+                ('source', models.CharField(blank=True, db_index=True, max_length=255, verbose_name='Исходный файл')),
+            ],
+        ),
+    ]
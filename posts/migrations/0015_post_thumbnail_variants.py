@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_storedfile'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='thumbnail_variants',
+            field=models.TextField(blank=True, editable=False, verbose_name='Варианты миниатюры'),
+        ),
+    ]
@@ -19,6 +19,11 @@ class Group(models.Model):
         return f'{self.title} {self.description}'
 
 
+class PostQuerySet(models.QuerySet):
+    def feed(self):
+        return self.select_related('author', 'group')
+
+
 class Post(models.Model):
     text = models.TextField()
     pub_date = models.DateTimeField(
@@ -39,12 +44,77 @@ class Post(models.Model):
         related_name='posts'
     )
     image = models.ImageField(upload_to='posts/', blank=True, null=True)
+    thumbnail = models.ImageField(
+        upload_to='posts/thumbs/',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    # заполняются воркером после обработки картинки (posts.images)
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки',
+        blank=True,
+        null=True,
+        editable=False
+    )
+    image_blurhash = models.CharField(
+        'BlurHash картинки',
+        max_length=64,
+        blank=True,
+        editable=False
+    )
+    # миниатюры разной ширины для srcset: «имя 320w, имя 640w, ...»
+    thumbnail_variants = models.TextField(
+        'Варианты миниатюры',
+        blank=True,
+        editable=False
+    )
+    comment_count = models.PositiveIntegerField(
+        'Комментариев',
+        default=0,
+        editable=False
+    )
+    version = models.PositiveIntegerField(
+        'Версия',
+        default=1,
+        editable=False
+    )
+
+    objects = PostQuerySet.as_manager()
 
     def __str__(self):
         return f'{self.author} {self.text}'
 
+    @property
+    def variants(self):
+        """Пары (имя файла, ширина) вариантов миниатюры."""
+        return [
+            (name, int(width[:-1]))
+            for name, width in (
+                item.split(' ') for item in self.thumbnail_variants.split(', ')
+                if item
+            )
+        ]
+
+    @property
+    def files(self):
+        """Имена всех файлов, на которые ссылается запись."""
+        names = {self.image.name, self.thumbnail.name}
+        names.update(name for name, width in self.variants)
+        return names - {None, ''}
+
     class Meta:
         ordering = ['-pub_date']
+        indexes = [
+            models.Index(fields=['group', 'pub_date']),
+            models.Index(fields=['author', 'pub_date']),
+        ]
 
 
 class Comment(models.Model):
@@ -66,6 +136,9 @@ class Comment(models.Model):
 
     class Meta:
         ordering = ['-created']
+        indexes = [
+            models.Index(fields=['post', 'created']),
+        ]
 
 
 class Follow(models.Model):
@@ -89,3 +162,90 @@ class Follow(models.Model):
     class Meta:
         ordering = ['-created']
         unique_together = ('user', 'author')
+
+
+class UserStats(models.Model):
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Записей', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    comments_count = models.PositiveIntegerField('Комментариев', default=0)
+
+    def __str__(self):
+        return f'{self.user} {self.posts_count}'
+
+    @classmethod
+    def increment(cls, user_id, field, delta=1):
+        if user_id is None:
+            return
+        stats = cls.objects.filter(user_id=user_id)
+        if delta < 0:
+            # счётчик мог разойтись с данными: не уходим ниже нуля
+            stats = stats.filter(**{f'{field}__gte': -delta})
+        stats.update(**{field: models.F(field) + delta})
+
+    @classmethod
+    def of(cls, user):
+        """Счётчики пользователя; недостающую строку считаем по данным.
+
+        Строки нет у пользователей, сохранённых в обход сигнала
+        create_user_stats, например загруженных через loaddata.
+        """
+        try:
+            return user.stats
+        except cls.DoesNotExist:
+            pass
+        stats, created = cls.objects.get_or_create(user=user, defaults={
+            'posts_count': Post.objects.filter(author=user).count(),
+            'followers_count': Follow.objects.filter(author=user).count(),
+            'following_count': Follow.objects.filter(user=user).count(),
+            'comments_count': Comment.objects.filter(author=user).count(),
+        })
+        user.stats = stats
+        return stats
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries'
+    )
+    pub_date = models.DateTimeField('Дата публикации')
+
+    def __str__(self):
+        return f'{self.user} {self.post_id}'
+
+    class Meta:
+        ordering = ['-pub_date']
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date']),
+        ]
+
+
+class StoredFile(models.Model):
+    """Файл хранилища с адресацией по содержимому (posts.storage)."""
+    name = models.CharField('Имя', max_length=255, primary_key=True)
+    reference_count = models.PositiveIntegerField('Ссылок', default=0)
+    # из какого загруженного файла получен: по нему воркер находит
+    # уже готовую обработку той же картинки (posts.images)
+    source = models.CharField(
+        'Исходный файл',
+        max_length=255,
+        blank=True,
+        db_index=True
+    )
+
+    def __str__(self):
+        return f'{self.name} {self.reference_count}'
@@ -0,0 +1,148 @@
+import base64
+import binascii
+import json
+
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorPage:
+    """Одна страница ленты, полученная по курсору.
+
+    Хранит только материализованный список объектов и курсоры соседних
+    страниц, поэтому её можно безопасно класть в кэш.
+    """
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return f'<CursorPage {self.previous_cursor}:{self.next_cursor}>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """Пагинация по ключу сортировки вместо OFFSET/LIMIT.
+
+    Страница выбирается условием `(pub_date, id) < (курсор)`, которое
+    обслуживается индексом, поэтому глубина страницы не влияет на время
+    запроса, а `COUNT(*)` не выполняется вовсе.
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-pub_date', '-id')):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.ordering = tuple(ordering)
+        self.fields = [name.lstrip('-') for name in self.ordering]
+        self.descending = self.ordering[0].startswith('-')
+
+    def encode_cursor(self, obj):
+        values = []
+        for name in self.fields:
+            value = getattr(obj, name)
+            field = self.queryset.model._meta.get_field(name)
+            values.append(field.value_to_string(obj) if value is not None
+                          else None)
+        raw = json.dumps(values, separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        except (binascii.Error, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        if not isinstance(values, list) or len(values) != len(self.fields):
+            raise InvalidCursor(cursor)
+        model = self.queryset.model
+        try:
+            return [
+                model._meta.get_field(name).to_python(value)
+                for name, value in zip(self.fields, values)
+            ]
+        except Exception:
+            raise InvalidCursor(cursor)
+
+    def _seek(self, values, forward):
+        # (a, b) < (x, y)  <=>  a < x OR (a = x AND b < y)
+        older = forward == self.descending
+        lookup = 'lt' if older else 'gt'
+        condition = Q()
+        for index, name in enumerate(self.fields):
+            clause = Q(**{f'{name}__{lookup}': values[index]})
+            for prev_name, prev_value in zip(self.fields[:index], values):
+                clause &= Q(**{prev_name: prev_value})
+            condition |= clause
+        return condition
+
+    def _reverse_ordering(self):
+        return [
+            name[1:] if name.startswith('-') else f'-{name}'
+            for name in self.ordering
+        ]
+
+    def page(self, after=None, before=None):
+        queryset = self.queryset
+        if before:
+            values = self.decode_cursor(before)
+            rows = list(
+                queryset.filter(self._seek(values, forward=False))
+                .order_by(*self._reverse_ordering())[:self.per_page + 1]
+            )
+            if len(rows) <= self.per_page:
+                # Дошли до начала ленты: отдаём полноценную первую страницу.
+                return self.page()
+            rows = rows[:self.per_page][::-1]
+            return CursorPage(
+                rows,
+                next_cursor=self.encode_cursor(rows[-1]),
+                previous_cursor=self.encode_cursor(rows[0]),
+            )
+        if after:
+            queryset = queryset.filter(
+                self._seek(self.decode_cursor(after), forward=True))
+        rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        return CursorPage(
+            rows,
+            next_cursor=self.encode_cursor(rows[-1]) if has_more else None,
+            previous_cursor=(
+                self.encode_cursor(rows[0]) if after and rows else None),
+        )
+
+    def get_page(self, request):
+        """Вернуть страницу по параметрам `?after=`/`?before=` запроса.
+
+        Повреждённый курсор не приводит к ошибке — отдаётся первая
+        страница, так же как `Paginator.get_page` поступает с номером.
+        """
+        try:
+            return self.page(
+                after=request.GET.get('after'),
+                before=request.GET.get('before'),
+            )
+        except InvalidCursor:
+            return self.page()
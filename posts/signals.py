@@ -0,0 +1,156 @@
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import feed_cache, timeline
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+def create_user_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Post)
+def count_new_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.increment(instance.author_id, 'posts_count')
+        timeline.fan_out(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    UserStats.increment(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def count_new_follow(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.increment(instance.author_id, 'followers_count')
+        UserStats.increment(instance.user_id, 'following_count')
+        if instance.user_id and instance.author_id:
+            timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def count_deleted_follow(sender, instance, **kwargs):
+    UserStats.increment(instance.author_id, 'followers_count', -1)
+    UserStats.increment(instance.user_id, 'following_count', -1)
+    if instance.user_id and instance.author_id:
+        timeline.evict(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=Comment)
+def count_new_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        UserStats.increment(instance.author_id, 'comments_count')
+        Post.objects.filter(pk=instance.post_id).update(
+            comment_count=F('comment_count') + 1,
+            version=F('version') + 1
+        )
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    UserStats.increment(instance.author_id, 'comments_count', -1)
+    Post.objects.filter(pk=instance.post_id, comment_count__gt=0).update(
+        comment_count=F('comment_count') - 1,
+        version=F('version') + 1
+    )
+
+
+def bump_post_feeds(post, *group_ids):
+    feed_cache.bump(
+        'index',
+        feed_cache.author_scope(post.author_id),
+        *(feed_cache.group_scope(group_id)
+          for group_id in {post.group_id, *group_ids}),
+    )
+
+
+@receiver(pre_save, sender=Post)
+def prepare_post_update(sender, instance, raw=False, **kwargs):
+    if not instance.pk or raw:
+        return
+    stored = Post.objects.filter(pk=instance.pk).values(
+        'group_id', 'comment_count', 'version', 'image', 'thumbnail',
+        'thumbnail_variants'
+    ).first()
+    if stored is None:
+        return
+    instance._previous_group_id = stored['group_id']
+    # файлы, на которые запись после сохранения больше не ссылается
+    previous = Post(
+        image=stored['image'],
+        thumbnail=stored['thumbnail'],
+        thumbnail_variants=stored['thumbnail_variants'],
+    )
+    instance._replaced_files = previous.files - instance.files
+    # счётчик могли увеличить после загрузки записи — не затираем его
+    instance.comment_count = stored['comment_count']
+    # новая версия — новый ключ закэшированной карточки
+    instance.version = stored['version'] + 1
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def invalidate_post_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_post_feeds(
+            instance, getattr(instance, '_previous_group_id', None))
+
+
+def release_files(names):
+    names = [name for name in names if name]
+    # без хранилища со счётчиками ссылок файлы не удаляются, как раньше
+    if not names or not hasattr(default_storage, 'release'):
+        return
+
+    def release():
+        for name in names:
+            default_storage.release(name)
+
+    transaction.on_commit(release)
+
+
+@receiver(post_save, sender=Post)
+def release_replaced_files(sender, instance, raw=False, **kwargs):
+    replaced = instance.__dict__.pop('_replaced_files', ())
+    if not raw:
+        release_files(replaced)
+
+
+@receiver(post_delete, sender=Post)
+def release_post_files(sender, instance, **kwargs):
+    release_files(instance.files)
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def invalidate_comment_feeds(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    try:
+        post = instance.post
+    except Post.DoesNotExist:
+        return
+    bump_post_feeds(post)
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+def invalidate_group_feeds(sender, instance, raw=False, **kwargs):
+    if not raw:
+        feed_cache.bump(feed_cache.GLOBAL_SCOPE)
+
+
+@receiver(post_save, sender=Group)
+def invalidate_group_cards(sender, instance, created, raw=False, **kwargs):
+    if not created and not raw:
+        instance.posts.update(version=F('version') + 1)
@@ -0,0 +1,83 @@
+"""Хранилище медиа с адресацией по содержимому.
+
+Файл получает имя по SHA-256 содержимого в каталоге upload_to, поэтому
+одинаковые загрузки (репост, повторная отправка формы) ложатся в один
+файл. Выданные имена считаются в StoredFile: save() добавляет ссылку,
+release() снимает её, а сам файл удаляется вместе с последней.
+
+Файлы без строки в StoredFile загружены до перехода (их переносит команда
+migrate_media) или указаны записи в обход хранилища. release() их не
+трогает: на такой файл могут ссылаться несколько записей. delete()
+удаляет их сразу, как FileSystemStorage.
+"""
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F
+
+from .models import StoredFile
+
+
+class ContentAddressedStorage(FileSystemStorage):
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest.hexdigest() + extension)
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        name = self.content_name(name, content).replace('\\', '/')
+        with transaction.atomic():
+            StoredFile.objects.select_for_update().get_or_create(name=name)
+            if not self.exists(name):
+                self._save(name, content)
+            StoredFile.objects.filter(pk=name).update(
+                reference_count=F('reference_count') + 1)
+        return name
+
+    def acquire(self, *names):
+        """Добавить по ссылке на уже сохранённые файлы.
+
+        Если какой-то файл успели удалить, ничего не меняет и возвращает
+        False.
+        """
+        with transaction.atomic():
+            acquired = StoredFile.objects.filter(
+                pk__in=names, reference_count__gt=0
+            ).update(reference_count=F('reference_count') + 1)
+            if acquired != len(set(names)):
+                transaction.set_rollback(True)
+                return False
+        return True
+
+    def release(self, name):
+        """Снять ссылку на файл, с последней ссылкой удалить и сам файл.
+
+        Для файлов вне учёта возвращает False и ничего не делает.
+        """
+        with transaction.atomic():
+            stored = StoredFile.objects.select_for_update().filter(
+                pk=name).first()
+            if stored is None:
+                return False
+            if stored.reference_count > 1:
+                StoredFile.objects.filter(pk=name).update(
+                    reference_count=F('reference_count') - 1)
+                return True
+            stored.delete()
+            super().delete(name)
+        return True
+
+    def delete(self, name):
+        if not self.release(name):
+            super().delete(name)
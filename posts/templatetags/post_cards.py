@@ -0,0 +1,93 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import images
+
+register = template.Library()
+
+EDIT_LINK_SLOT = mark_safe('<!-- post-edit-link -->')
+# sizes и loading зависят от страницы, а не от записи: в кэше метки
+SIZES_SLOT = mark_safe('<!-- post-card-sizes -->')
+LOADING_SLOT = mark_safe('<!-- post-card-loading -->')
+# ширина картинки карточки при ширинах .container из Bootstrap
+CARD_SIZES = {
+    'feed': '(min-width: 1200px) 1110px, (min-width: 992px) 930px, '
+            '(min-width: 768px) 690px, 100vw',
+    # колонка col-md-9 рядом с карточкой автора
+    'column': '(min-width: 1200px) 825px, (min-width: 992px) 690px, '
+              '(min-width: 768px) 510px, 100vw',
+}
+
+
+def card_key(post):
+    # pub_date отличает запись от удалённой, чей id SQLite выдал повторно
+    return 'post_card:{}:{}:{}'.format(
+        post.pk, post.pub_date.timestamp(), post.version
+    )
+
+
+def render_cards(posts, user, layout='feed'):
+    """HTML карточек записей, собранный из кэша одним get_many.
+
+    Закэшированная карточка не зависит от зрителя: на месте ссылки
+    «Редактировать» в ней стоит метка, которую заменяем только для автора.
+    Так же подставляются sizes по макету страницы и loading: картинку
+    первой карточки браузер грузит сразу, остальные — по мере прокрутки.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    missing = {}
+    for post, key in zip(posts, keys):
+        if key not in cards:
+            cards[key] = missing[key] = render_to_string(
+                'include/one_post.html',
+                {
+                    'post': post,
+                    'edit_link_slot': EDIT_LINK_SLOT,
+                    'sizes_slot': SIZES_SLOT,
+                    'loading_slot': LOADING_SLOT,
+                }
+            )
+    if missing:
+        cache.set_many(missing, settings.POST_CARD_CACHE_TIMEOUT)
+
+    html = []
+    for number, (post, key) in enumerate(zip(posts, keys)):
+        card = cards[key].replace(SIZES_SLOT, CARD_SIZES[layout]).replace(
+            LOADING_SLOT, 'lazy' if number else 'eager')
+        if user is not None and user.is_authenticated and (
+                user.pk == post.author_id):
+            card = card.replace(EDIT_LINK_SLOT, render_to_string(
+                'include/post_edit_link.html', {'post': post}
+            ))
+        html.append(card)
+    return mark_safe(''.join(html))
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts, layout='feed'):
+    return render_cards(posts, context.get('user'), layout)
+
+
+@register.simple_tag(takes_context=True)
+def post_card(context, post, layout='feed'):
+    return render_cards([post], context.get('user'), layout)
+
+
+@register.filter
+def srcset(post, extension):
+    """srcset из вариантов миниатюры записи с данным расширением."""
+    storage = post.thumbnail.storage
+    return ', '.join(
+        f'{storage.url(name)} {width}w' for name, width in post.variants
+        if name.endswith('.' + extension)
+    )
+
+
+@register.filter
+def placeholder(post):
+    return images.placeholder(post)
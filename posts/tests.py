@@ -1,13 +1,46 @@
-from io import BytesIO
+import os
+import re
+import runpy
+import shutil
+import tempfile
+import threading
+from io import BytesIO, StringIO
+from unittest import mock
+
 from PIL import Image
 from django.core.cache import cache
+from django.core.management import call_command
 from django.core.files.images import ImageFile
+from django.core.files.storage import FileSystemStorage
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import TestCase, Client
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, connections, transaction
+from django.db.models import F
+from django.template import Engine
+from django.template.loader_tags import IncludeNode
+from django.test import (
+    Client, RequestFactory, SimpleTestCase, TestCase, TransactionTestCase,
+    override_settings
+)
+from django.test.utils import CaptureQueriesContext
 from django.contrib.auth import get_user_model
-from django.urls import reverse
+from django.urls import NoReverseMatch, reverse
+from django.utils import timezone
+from posts import feed_cache
 from posts.forms import PostForm
-from posts.models import Post, Group, Comment, Follow
+from jobs.models import Job
+from jobs.queue import run_pending
+from posts import blurhash, images
+from posts.images import process_image
+from posts.templatetags.post_cards import CARD_SIZES, card_key
+from yatube.cache_backends import SQLiteCache, TieredCache
+from yatube.db import replicas
+from yatube.db.middleware import STICKY_COOKIE
+from yatube import templating
+from posts.models import (
+    Post, Group, Comment, Follow, StoredFile, TimelineEntry, UserStats
+)
 
 User = get_user_model()
 
@@ -283,3 +316,1313 @@ class YatubeTestCache(TestCase):
         cache.clear()
         response_new = self.client.get(reverse('index'))
         self.assertContains(response_new, post_text)
+
+
+class YatubeCursorPaginatorTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'post {i}', author=self.user) for i in range(25)
+        )
+        # одинаковая дата у всех постов: порядок держится только на id
+        Post.objects.update(pub_date=timezone.now())
+        self.expected = list(
+            Post.objects.order_by('-id').values_list('id', flat=True)
+        )
+        cache.clear()
+
+    def page_ids(self, response):
+        return [post.id for post in response.context['page']]
+
+    def test_walk_forward_and_back(self):
+        url = reverse('profile', kwargs={'username': self.user.username})
+        seen = []
+        pages = []
+        response = self.client.get(url)
+        while True:
+            page = response.context['page']
+            pages.append(self.page_ids(response))
+            seen.extend(self.page_ids(response))
+            if not page.has_next():
+                break
+            response = self.client.get(url, {'after': page.next_cursor})
+        self.assertEqual(seen, self.expected)
+        self.assertEqual([len(ids) for ids in pages], [10, 10, 5])
+
+        last_page = response.context['page']
+        response = self.client.get(
+            url, {'before': last_page.previous_cursor})
+        self.assertEqual(self.page_ids(response), pages[1])
+        response = self.client.get(
+            url, {'before': response.context['page'].previous_cursor})
+        self.assertEqual(self.page_ids(response), pages[0])
+        self.assertFalse(response.context['page'].has_previous())
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('index'), {'after': 'garbage!'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.page_ids(response), self.expected[:10])
+
+    def test_no_count_and_offset_queries(self):
+        first = self.client.get(reverse('index')).context['page']
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('index'), {'after': first.next_cursor})
+        for query in queries.captured_queries:
+            with self.subTest(sql=query['sql']):
+                self.assertNotIn('OFFSET', query['sql'])
+                self.assertNotIn('COUNT(*) AS "__count" FROM "posts_post"',
+                                 query['sql'])
+
+
+class YatubeUserStatsTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.author = User.objects.create_user(
+            username='Subscribed',
+            email='rs2.s@skynet.com',
+            password='qwerty123'
+        )
+        self.client.force_login(self.user)
+
+    def stats(self, user):
+        return UserStats.objects.get(user=user)
+
+    def test_counters_follow_views(self):
+        self.client.post(reverse('new_post'), {'text': 'TestText'})
+        post = Post.objects.create(text='post_text', author=self.author)
+        self.client.post(
+            reverse('add_comment', args=[self.author.username, post.id]),
+            data={'text': 'comment'},
+        )
+        self.client.get(reverse(
+            'profile_follow', kwargs={'username': self.author.username}))
+
+        user_stats = self.stats(self.user)
+        author_stats = self.stats(self.author)
+        self.assertEqual(user_stats.posts_count, 1)
+        self.assertEqual(user_stats.comments_count, 1)
+        self.assertEqual(user_stats.following_count, 1)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+
+        self.client.get(reverse(
+            'profile_unfollow', kwargs={'username': self.author.username}))
+        post.delete()
+        self.assertEqual(self.stats(self.user).following_count, 0)
+        self.assertEqual(self.stats(self.user).comments_count, 0)
+        self.assertEqual(self.stats(self.author).followers_count, 0)
+        self.assertEqual(self.stats(self.author).posts_count, 0)
+
+    def test_rebuild_command(self):
+        Post.objects.create(text='post_text', author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        UserStats.objects.update(posts_count=42, followers_count=7)
+        call_command('rebuild_user_stats', stdout=StringIO())
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+        self.assertEqual(self.stats(self.author).followers_count, 1)
+        self.assertEqual(self.stats(self.user).following_count, 1)
+        self.assertEqual(self.stats(self.user).posts_count, 0)
+
+    def test_pages_without_stats_row(self):
+        # как после loaddata: строку счётчиков сигнал не создал
+        post = Post.objects.create(text='post_text', author=self.author)
+        UserStats.objects.filter(user=self.author).delete()
+        for url in (
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('post', kwargs={
+                'username': self.author.username, 'post_id': post.id}),
+        ):
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Записей: 1')
+        self.assertEqual(self.stats(self.author).posts_count, 1)
+
+    def test_profile_has_no_aggregate_queries(self):
+        Post.objects.create(text='post_text', author=self.author)
+        for url in (
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('post', kwargs={
+                'username': self.author.username,
+                'post_id': self.author.posts.get().id,
+            }),
+        ):
+            with self.subTest(url=url):
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url)
+                self.assertContains(response, 'Записей: 1')
+                self.assertFalse(any(
+                    'COUNT(' in query['sql'] and (
+                        'posts_post' in query['sql']
+                        or 'posts_follow' in query['sql'])
+                    for query in queries.captured_queries
+                ))
+
+
+class YatubeFeedQueryBudgetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.author = User.objects.create_user(
+            username='Subscribed',
+            email='rs2.s@skynet.com',
+            password='qwerty123'
+        )
+        self.group = Group.objects.create(
+            description='test_group',
+            title='test',
+            slug='test_slug'
+        )
+        Follow.objects.create(user=self.user, author=self.author)
+        self.client.force_login(self.user)
+
+    def add_posts(self, count):
+        for i in range(count):
+            post = Post.objects.create(
+                text=f'post {i}', author=self.author, group=self.group)
+            Comment.objects.create(post=post, author=self.user, text='c')
+
+    def count_queries(self, url):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_query_count_does_not_depend_on_page_size(self):
+        urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.author.username}),
+            reverse('follow_index'),
+        )
+        self.add_posts(1)
+        single = {url: self.count_queries(url) for url in urls}
+        self.add_posts(9)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertEqual(self.count_queries(url), single[url])
+                self.assertLessEqual(single[url], 5)
+
+    def test_post_view_query_count(self):
+        post = Post.objects.create(text='post', author=self.author)
+        url = reverse('post', args=[self.author.username, post.id])
+        Comment.objects.create(post=post, author=self.user, text='c')
+        single = self.count_queries(url)
+        for i in range(5):
+            commenter = User.objects.create_user(username=f'commenter{i}')
+            Comment.objects.create(post=post, author=commenter, text='c')
+        self.assertEqual(self.count_queries(url), single)
+        # сессия, пользователь, запись с автором и подпиской, комментарии
+        self.assertLessEqual(single, 4)
+        self.assertContains(self.client.get(url), 'Отписаться')
+
+        self.client.logout()
+        self.assertLessEqual(self.count_queries(url), 2)
+
+    def test_add_comment_query_count(self):
+        post = Post.objects.create(text='post', author=self.author)
+        url = reverse('add_comment', args=[self.author.username, post.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'text': 'comment'})
+        self.assertEqual(response.status_code, 302)
+        self.assertLessEqual(len(queries), 10)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('SELECT')
+            and 'FROM "posts_comment"' in query['sql']
+        ])
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {'text': ''})
+        self.assertEqual(response.status_code, 200)
+        self.assertLessEqual(len(queries), 6)
+
+    def test_comment_count_rendered(self):
+        self.add_posts(1)
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '1 комментариев')
+        Comment.objects.all().delete()
+        self.assertEqual(Post.objects.get().comment_count, 0)
+        Post.objects.update(comment_count=5)
+        call_command('rebuild_comment_counts', stdout=StringIO())
+        self.assertEqual(Post.objects.get().comment_count, 0)
+
+
+class YatubeFeedIndexTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.group = Group.objects.create(
+            description='test_group',
+            title='test',
+            slug='test_slug'
+        )
+        Post.objects.bulk_create(
+            Post(text=f'post {i}', author=self.user, group=self.group)
+            for i in range(25)
+        )
+        self.post = Post.objects.order_by('id').first()
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'c {i}')
+            for i in range(5)
+        )
+
+    def feed_queries(self, url, **params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response, [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and 'ORDER BY' in query['sql']
+            and ('FROM "posts_post"' in query['sql']
+                 or 'FROM "posts_comment"' in query['sql'])
+        ]
+
+    def assertIndexOrdered(self, sql):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('INDEX', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    def test_feeds_read_in_index_order(self):
+        urls = (
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+        )
+        for url in urls:
+            response, first = self.feed_queries(url)
+            page = response.context['page']
+            _, second = self.feed_queries(url, after=page.next_cursor)
+            page = self.client.get(url, {'after': page.next_cursor})
+            _, previous = self.feed_queries(
+                url, before=page.context['page'].previous_cursor)
+            for sql in first + second + previous:
+                with self.subTest(url=url, sql=sql):
+                    self.assertIndexOrdered(sql)
+
+    def test_comments_read_in_index_order(self):
+        url = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+        _, queries = self.feed_queries(url)
+        comments = [sql for sql in queries if 'FROM "posts_comment"' in sql]
+        self.assertTrue(comments)
+        for sql in comments:
+            with self.subTest(sql=sql):
+                self.assertIndexOrdered(sql)
+
+
+@override_settings(COMMENTS_PAGE_SIZE=3)
+class YatubeCommentPaginationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.post = Post.objects.create(text='post', author=self.user)
+        self.post_url = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+        self.comments_url = reverse('post_comments', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        })
+
+    def add_comments(self, count):
+        authors = [
+            User.objects.create_user(username=f'commenter{i}')
+            for i in range(User.objects.count(), User.objects.count() + count)
+        ]
+        for author in authors:
+            Comment.objects.create(
+                post=self.post, author=author, text=f'by {author.username}')
+        return list(
+            Comment.objects.order_by('-created', '-id')
+            .values_list('text', flat=True)
+        )
+
+    def texts(self, comments):
+        return [comment.text for comment in comments]
+
+    def test_post_page_renders_first_page_only(self):
+        expected = self.add_comments(7)
+        response = self.client.get(self.post_url)
+        comments = response.context['comments']
+        self.assertEqual(self.texts(comments), expected[:3])
+        self.assertNotContains(response, expected[3])
+        self.assertContains(response, 'data-comments-url')
+
+    def test_load_more_walks_all_comments(self):
+        self.add_comments(7)
+        expected = list(
+            Comment.objects.order_by('-created', '-id')
+            .values_list('id', flat=True)
+        )
+        page = self.client.get(self.post_url).context['comments']
+        seen = [comment.id for comment in page]
+        url = '{}?after={}&format=json'.format(
+            self.comments_url, page.next_cursor)
+        while url:
+            data = self.client.get(url).json()
+            seen.extend(
+                int(pk) for pk in re.findall(r'name="comment_(\d+)"',
+                                             data['html'])
+            )
+            url = data['next']
+        self.assertEqual(seen, expected)
+
+    def test_html_fragment(self):
+        expected = self.add_comments(5)
+        page = self.client.get(self.post_url).context['comments']
+        response = self.client.get(
+            self.comments_url, {'after': page.next_cursor})
+        self.assertEqual(self.texts(response.context['comments']),
+                         expected[3:])
+        self.assertNotContains(response, 'data-comments-url')
+        self.assertNotContains(response, '<html')
+
+    def test_fragment_conditional_get(self):
+        self.add_comments(1)
+        response = self.client.get(self.comments_url)
+        response = self.client.get(
+            self.comments_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_query_count_does_not_depend_on_comments(self):
+        self.add_comments(1)
+        with CaptureQueriesContext(connection) as single:
+            self.client.get(self.comments_url)
+        self.add_comments(5)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(self.comments_url)
+        self.assertEqual(len(many), len(single))
+
+
+@override_settings(TIMELINE_LENGTH=3, TIMELINE_FANOUT_MAX_FOLLOWERS=1)
+class YatubeTimelineTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.author = User.objects.create_user(
+            username='Subscribed',
+            email='rs2.s@skynet.com',
+            password='qwerty123'
+        )
+        self.client.force_login(self.user)
+
+    def feed_texts(self):
+        response = self.client.get(reverse('follow_index'))
+        return [post.text for post in response.context['page']]
+
+    def test_fan_out_is_bounded(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        for i in range(5):
+            Post.objects.create(text=f'post {i}', author=self.author)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.user).count(), 3)
+        self.assertEqual(
+            self.feed_texts(), ['post 4', 'post 3', 'post 2'])
+
+    @override_settings(TIMELINE_FANOUT_MAX_FOLLOWERS=10)
+    def test_trim_is_one_delete(self):
+        followers = [self.user] + [
+            User.objects.create_user(username=f'fan{i}', password='qwerty123')
+            for i in range(3)
+        ]
+        for follower in followers:
+            Follow.objects.create(user=follower, author=self.author)
+        for i in range(3):
+            Post.objects.create(text=f'post {i}', author=self.author)
+        with CaptureQueriesContext(connection) as queries:
+            Post.objects.create(text='post 3', author=self.author)
+        deletes = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('DELETE')
+            and 'posts_timelineentry' in query['sql']
+        ]
+        self.assertEqual(len(deletes), 1)
+        for follower in followers:
+            self.assertEqual(
+                TimelineEntry.objects.filter(user=follower).count(), 3)
+        self.assertEqual(
+            self.feed_texts(), ['post 3', 'post 2', 'post 1'])
+
+    def test_follow_backfills_and_unfollow_evicts(self):
+        Post.objects.create(text='old post', author=self.author)
+        self.client.get(reverse(
+            'profile_follow', kwargs={'username': self.author.username}))
+        self.assertEqual(self.feed_texts(), ['old post'])
+        self.client.get(reverse(
+            'profile_unfollow', kwargs={'username': self.author.username}))
+        self.assertEqual(self.feed_texts(), [])
+        self.assertFalse(TimelineEntry.objects.exists())
+
+    def test_celebrity_posts_are_pulled(self):
+        fan = User.objects.create_user(username='fan', password='qwerty123')
+        Follow.objects.create(user=fan, author=self.author)
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(text='celebrity post', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), ['celebrity post'])
+
+    @override_settings(TIMELINE_FANOUT=False)
+    def test_pull_without_fan_out(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(text='post', author=self.author)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assertEqual(self.feed_texts(), ['post'])
+
+    @override_settings(TIMELINE_FANOUT_INLINE_MAX=0)
+    def test_large_fan_out_runs_in_worker(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(text='queued post', author=self.author)
+        self.assertEqual(self.feed_texts(), [])
+        run_pending()
+        self.assertEqual(self.feed_texts(), ['queued post'])
+
+    def test_rebuild_command(self):
+        Follow.objects.create(user=self.user, author=self.author)
+        Post.objects.create(text='post', author=self.author)
+        TimelineEntry.objects.all().delete()
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(self.feed_texts(), ['post'])
+
+
+class YatubeFeedCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.group = Group.objects.create(
+            description='test_group',
+            title='test',
+            slug='test_slug'
+        )
+        self.urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+        )
+
+    def test_new_post_visible_immediately(self):
+        for url in self.urls:
+            self.client.get(url)
+        Post.objects.create(text='fresh', author=self.user, group=self.group)
+        for url in self.urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'fresh')
+
+    def test_comment_and_edit_invalidate(self):
+        post = Post.objects.create(
+            text='post', author=self.user, group=self.group)
+        self.client.get(self.urls[0])
+        Comment.objects.create(post=post, author=self.user, text='c')
+        self.assertContains(self.client.get(self.urls[0]), '1 комментариев')
+        post.text = 'edited'
+        post.group = None
+        post.save()
+        self.assertContains(self.client.get(self.urls[0]), 'edited')
+        self.assertNotContains(self.client.get(self.urls[1]), 'edited')
+
+    def test_cached_page_saves_queries(self):
+        Post.objects.create(text='post', author=self.user)
+        self.client.get(self.urls[0])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.urls[0])
+        # остаётся только сверка состояния страницы с базой, без join'ов
+        post_queries = [
+            query['sql'] for query in queries.captured_queries
+            if 'FROM "posts_post"' in query['sql']
+        ]
+        self.assertEqual(len(post_queries), 1)
+        self.assertNotIn('JOIN', post_queries[0])
+
+    def test_stale_page_served_while_rebuilding(self):
+        Post.objects.create(text='old', author=self.user)
+        self.client.get(self.urls[0])
+        feed_cache.bump('index')
+        request = RequestFactory().get(self.urls[0])
+        lock_key = feed_cache.page_key('index', request) + ':lock'
+        cache.add(lock_key, 1)
+        self.assertContains(self.client.get(self.urls[0]), 'old')
+        # копия, разошедшаяся с базой, не отдаётся и под блокировкой
+        Post.objects.create(text='new', author=self.user)
+        self.assertContains(self.client.get(self.urls[0]), 'new')
+        cache.delete(lock_key)
+
+
+class YatubePostCardCacheTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.other = User.objects.create_user(
+            username='Subscribed',
+            email='rs2.s@skynet.com',
+            password='qwerty123'
+        )
+        self.post = Post.objects.create(text='post_text', author=self.user)
+        self.post_url = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.id})
+
+    def test_edit_link_is_viewer_dependent(self):
+        edit_url = reverse('post_edit', kwargs={
+            'username': self.user.username, 'post_id': self.post.id})
+        self.client.force_login(self.other)
+        self.assertNotContains(self.client.get(reverse('index')), edit_url)
+        self.assertTrue(cache.get(card_key(self.post)))
+        self.client.force_login(self.user)
+        self.assertContains(self.client.get(reverse('index')), edit_url)
+        self.assertContains(self.client.get(self.post_url), edit_url)
+
+    def test_cards_fetched_with_one_get_many(self):
+        self.client.get(reverse('index'))
+        with mock.patch.object(
+                cache, 'get_many', wraps=cache.get_many) as get_many:
+            with mock.patch(
+                    'posts.templatetags.post_cards.render_to_string'
+            ) as render:
+                self.client.get(self.post_url)
+        render.assert_not_called()
+        get_many.assert_any_call([card_key(self.post)])
+
+    def test_edit_and_comment_invalidate_card(self):
+        self.client.force_login(self.user)
+        self.client.get(self.post_url)
+        self.client.post(
+            reverse('post_edit', args=[self.user.username, self.post.id]),
+            data={'text': 'edited_text'},
+        )
+        self.assertContains(self.client.get(self.post_url), 'edited_text')
+        self.client.post(
+            reverse('add_comment', args=[self.user.username, self.post.id]),
+            data={'text': 'comment'},
+        )
+        self.assertContains(self.client.get(reverse('index')),
+                            '1 комментариев')
+
+
+class YatubeSharedCacheTest(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.location = os.path.join(self.directory, 'cache.sqlite3')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def make_sqlite_cache(self, **options):
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def test_sqlite_cache_is_shared_between_instances(self):
+        first = self.make_sqlite_cache()
+        second = self.make_sqlite_cache()
+        first.set('key', {'value': 1})
+        self.assertEqual(second.get('key'), {'value': 1})
+        self.assertFalse(second.add('key', 'other'))
+        self.assertTrue(second.add('counter', 1))
+        self.assertEqual(first.incr('counter'), 2)
+        self.assertEqual(first.get_many(['key', 'counter', 'missing']),
+                         {'key': {'value': 1}, 'counter': 2})
+        first.delete('key')
+        self.assertIsNone(second.get('key'))
+        with self.assertRaises(ValueError):
+            second.incr('missing')
+
+    def test_sqlite_cache_expiry_and_culling(self):
+        sqlite_cache = self.make_sqlite_cache(
+            MAX_ENTRIES=10, CULL_FREQUENCY=2)
+        sqlite_cache.set('expired', 1, timeout=-1)
+        self.assertIsNone(sqlite_cache.get('expired'))
+        for i in range(30):
+            sqlite_cache.set(f'key{i}', i)
+        self.assertEqual(sqlite_cache.get('key29'), 29)
+        stored = sum(
+            sqlite_cache.has_key(f'key{i}') for i in range(30))
+        self.assertLessEqual(stored, 10)
+
+    def test_tiered_cache(self):
+        shared = self.make_sqlite_cache()
+        with mock.patch.object(TieredCache, 'shared', shared):
+            tiered = TieredCache(None, {'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_MAX_ENTRIES': 2,
+                'BYPASS_PREFIXES': ('gen:',),
+            }})
+            tiered.set('a', 1)
+            shared.set('a', 'changed elsewhere')
+            self.assertEqual(tiered.get('a'), 1)
+
+            tiered.set('b', 2)
+            tiered.set('c', 3)
+            self.assertEqual(len(tiered._local), 2)
+            self.assertEqual(tiered.get('a'), 'changed elsewhere')
+
+            tiered.set('gen:index', 1)
+            shared.incr('gen:index')
+            self.assertEqual(tiered.get('gen:index'), 2)
+            self.assertEqual(tiered.get_many(['gen:index', 'b']),
+                             {'gen:index': 2, 'b': 2})
+            tiered.delete('b')
+            self.assertIsNone(shared.get('b'))
+            self.assertIsNone(tiered.get('b'))
+
+
+class YatubeThumbnailTest(TestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        media = override_settings(MEDIA_ROOT=directory)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.client.force_login(self.user)
+
+    def generate_image(self, size=(100, 100)):
+        file = BytesIO()
+        Image.new('RGB', size=size, color=(155, 0, 0)).save(file, 'png')
+        file.seek(0)
+        return SimpleUploadedFile('test.png', file.read(), 'image/png')
+
+    def generate_photo(self, size=(3000, 2000)):
+        # снимок с телефона: EXIF с поворотом на 90° и моделью камеры
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x0110] = 'Phone'
+        file = BytesIO()
+        Image.new('RGB', size=size, color=(0, 155, 0)).save(
+            file, 'jpeg', exif=exif.tobytes())
+        return SimpleUploadedFile('photo.jpg', file.getvalue(), 'image/jpeg')
+
+    def test_thumbnail_generated_by_worker(self):
+        self.client.post(
+            reverse('new_post'),
+            {'text': 'with image', 'image': self.generate_image()}
+        )
+        post = Post.objects.get()
+        self.addCleanup(post.image.delete, save=False)
+        self.assertFalse(post.thumbnail)
+        self.assertTrue(Job.objects.filter(
+            name=process_image.task_name, status=Job.QUEUED).exists())
+        self.assertContains(self.client.get(reverse('index')),
+                            post.image.url)
+
+        self.assertEqual(run_pending(), 1)
+        post.refresh_from_db()
+        self.addCleanup(post.image.delete, save=False)
+        self.addCleanup(post.thumbnail.delete, save=False)
+        with Image.open(post.thumbnail) as thumbnail:
+            self.assertEqual(thumbnail.size, (960, 339))
+        self.assertContains(self.client.get(reverse('index')),
+                            post.thumbnail.url)
+
+    def test_thumbnail_variants_in_card(self):
+        for text in ('first', 'second'):
+            self.client.post(
+                reverse('new_post'),
+                {'text': text, 'image': self.generate_image((2400, 1600))}
+            )
+        run_pending()
+        post = Post.objects.latest('pk')
+        for name in post.files:
+            self.addCleanup(post.image.storage.delete, name)
+        self.assertEqual(
+            sorted(width for name, width in post.variants),
+            [320, 320, 640, 640, 960, 960, 1920, 1920]
+        )
+        self.assertIn((post.thumbnail.name, 960), post.variants)
+        small = [name for name, width in post.variants if width == 320]
+        for name in small:
+            with post.image.storage.open(name) as image_file:
+                with Image.open(image_file) as thumbnail:
+                    self.assertEqual(thumbnail.size, (320, 113))
+
+        response = self.client.get(reverse('index'))
+        self.assertContains(response, '<source type="image/webp" srcset="')
+        self.assertContains(response, ' 1920w"', count=4)
+        self.assertContains(response, f'sizes="{CARD_SIZES["feed"]}"')
+        self.assertContains(response, 'loading="eager"', count=1)
+        self.assertContains(response, 'loading="lazy"', count=1)
+        self.assertContains(response, 'url(data:image/png;base64,')
+        response = self.client.get(reverse('profile', args=['Osol']))
+        self.assertContains(response, f'sizes="{CARD_SIZES["column"]}"')
+
+    @override_settings(IMAGE_MAX_SIDE=800, IMAGE_FORMAT='WEBP')
+    def test_photo_reencoded_without_metadata(self):
+        self.client.post(
+            reverse('new_post'),
+            {'text': 'photo', 'image': self.generate_photo()}
+        )
+        run_pending()
+        post = Post.objects.get()
+        self.addCleanup(post.image.delete, save=False)
+        self.addCleanup(post.thumbnail.delete, save=False)
+        self.assertTrue(post.image.name.endswith('.webp'))
+        with Image.open(post.image) as image:
+            self.assertEqual(image.format, 'WEBP')
+            self.assertEqual(image.size, (533, 800))
+            self.assertFalse(image.getexif())
+        self.assertEqual((post.image_width, post.image_height), (533, 800))
+        self.assertEqual(len(post.image_blurhash), 28)
+
+    @override_settings(IMAGE_FORMAT='JPEG')
+    def test_progressive_jpeg(self):
+        self.client.post(
+            reverse('new_post'),
+            {'text': 'photo', 'image': self.generate_photo((400, 300))}
+        )
+        run_pending()
+        post = Post.objects.get()
+        self.addCleanup(post.image.delete, save=False)
+        self.addCleanup(post.thumbnail.delete, save=False)
+        with Image.open(post.image) as image:
+            self.assertEqual(image.format, 'JPEG')
+            self.assertTrue(image.info.get('progressive'))
+            self.assertNotIn('exif', image.info)
+
+    @override_settings(IMAGE_UPLOAD_MAX_PIXELS=100 * 100)
+    def test_dimensions_checked_from_header(self):
+        response = self.client.post(
+            reverse('new_post'),
+            {'text': 'huge', 'image': self.generate_image((200, 100))}
+        )
+        self.assertFormError(
+            response, 'form', 'image',
+            'Картинка 200×100 слишком большая: не больше 0 мегапикселей.'
+        )
+        self.assertFalse(Post.objects.exists())
+
+    @override_settings(FILE_UPLOAD_MAX_SIZE=1024)
+    def test_upload_size_bounded(self):
+        response = self.client.post(
+            reverse('new_post'),
+            {'text': 'big', 'image': self.generate_photo((300, 300))}
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Post.objects.exists())
+
+    def test_uploaded_original_readable(self):
+        self.client.post(
+            reverse('new_post'),
+            {'text': 'with image', 'image': self.generate_photo((300, 200))}
+        )
+        post = Post.objects.get()
+        self.assertEqual(os.stat(post.image.path).st_mode & 0o777, 0o644)
+
+    def test_process_images_command(self):
+        post = Post.objects.create(
+            text='seeded', author=self.user,
+            image=ImageFile(self.generate_image(), 'seeded.png'))
+        out = StringIO()
+        call_command('process_images', '--inline', stdout=out)
+        post.refresh_from_db()
+        self.addCleanup(post.image.delete, save=False)
+        self.addCleanup(post.thumbnail.delete, save=False)
+        self.assertEqual((post.image_width, post.image_height), (100, 100))
+        self.assertTrue(post.thumbnail)
+        self.assertIn('1', out.getvalue())
+
+    def test_blurhash(self):
+        # значения сверены с эталонной реализацией blurhash
+        self.assertEqual(
+            blurhash.encode(Image.new('RGB', (32, 32), (255, 0, 0))),
+            'L9TI:j|cfQ|c|co1fQo1fQfQfQfQ'
+        )
+        gradient = Image.linear_gradient('L').convert('RGB').resize((32, 24))
+        self.assertEqual(blurhash.encode(gradient),
+                         'LyHV9woffQof00WBfQWBxuj[fQj[')
+
+        red = blurhash.decode('L9TI:j|cfQ|c|co1fQo1fQfQfQfQ', 4, 3)
+        for pixel in red.getdata():
+            self.assertLessEqual(
+                max(abs(a - b) for a, b in zip(pixel, (255, 0, 0))), 4)
+        decoded = blurhash.decode(blurhash.encode(gradient), 1, 4)
+        column = [pixel[0] for pixel in decoded.getdata()]
+        self.assertEqual(column, sorted(column))
+
+
+class YatubeContentStorageTest(TransactionTestCase):
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        media = override_settings(MEDIA_ROOT=directory)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.client.force_login(self.user)
+
+    def generate_image(self, color=(155, 0, 0)):
+        file = BytesIO()
+        Image.new('RGB', size=(100, 100), color=color).save(file, 'png')
+        return SimpleUploadedFile('test.png', file.getvalue(), 'image/png')
+
+    def new_post(self, image):
+        self.client.post(
+            reverse('new_post'), {'text': 'with image', 'image': image})
+        return Post.objects.latest('pk')
+
+    def references(self, name):
+        return StoredFile.objects.get(pk=name).reference_count
+
+    def test_same_content_stored_once(self):
+        first = self.new_post(self.generate_image())
+        second = self.new_post(self.generate_image())
+        self.assertRegex(first.image.name, r'^posts/[0-9a-f]{64}\.png$')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(self.references(first.image.name), 2)
+        self.assertEqual(len(os.listdir(first.image.storage.path('posts'))),
+                         1)
+
+        first.delete()
+        self.assertTrue(first.image.storage.exists(second.image.name))
+        self.assertEqual(self.references(second.image.name), 1)
+        second.delete()
+        self.assertFalse(second.image.storage.exists(second.image.name))
+        self.assertFalse(StoredFile.objects.exists())
+
+    def test_processing_shared_between_posts(self):
+        first = self.new_post(self.generate_image())
+        second = self.new_post(self.generate_image())
+        original = first.image.name
+        with mock.patch('posts.images.process',
+                        wraps=images.process) as process:
+            self.assertEqual(run_pending(), 2)
+        self.assertEqual(process.call_count, 1)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.thumbnail.name, second.thumbnail.name)
+        self.assertEqual(second.image_blurhash, first.image_blurhash)
+        self.assertEqual(self.references(first.thumbnail.name), 2)
+        self.assertFalse(first.image.storage.exists(original))
+
+        # повторная загрузка уже обработанного файла тоже не декодируется
+        with first.image.open('rb') as image_file:
+            repost = self.new_post(SimpleUploadedFile(
+                'repost.webp', image_file.read(), 'image/webp'))
+        with mock.patch('posts.images.process') as process:
+            run_pending()
+        process.assert_not_called()
+        repost.refresh_from_db()
+        self.assertEqual(repost.image.name, first.image.name)
+        self.assertEqual(self.references(first.image.name), 3)
+
+    def test_replaced_image_released(self):
+        post = self.new_post(self.generate_image())
+        run_pending()
+        post.refresh_from_db()
+        old = [post.image.name, post.thumbnail.name]
+        self.client.post(
+            reverse('post_edit', args=[self.user.username, post.pk]),
+            {'text': 'new image', 'image': self.generate_image((0, 0, 155))}
+        )
+        for name in old:
+            self.assertFalse(post.image.storage.exists(name))
+        self.assertFalse(StoredFile.objects.filter(pk__in=old).exists())
+
+    def test_edit_page_thumbnail_not_counted(self):
+        post = self.new_post(self.generate_image())
+        url = reverse('post_edit', args=[self.user.username, post.pk])
+        references = list(StoredFile.objects.values_list(
+            'name', 'reference_count'))
+        for _ in range(2):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(
+            list(StoredFile.objects.values_list('name', 'reference_count')),
+            references)
+
+    def test_unmanaged_files_kept(self):
+        # файл указан записи в обход хранилища, как до migrate_media
+        name = FileSystemStorage().save('posts/legacy.png',
+                                        self.generate_image())
+        Post.objects.create(text='legacy', author=self.user, image=name)
+        Post.objects.create(text='legacy', author=self.user, image=name)
+        Post.objects.first().delete()
+        self.assertTrue(FileSystemStorage().exists(name))
+
+    def test_migrate_media(self):
+        storage = FileSystemStorage()
+        image = self.generate_image()
+        names = [storage.save('posts/first.png', image),
+                 storage.save('posts/second.png', image)]
+        posts = [Post.objects.create(text=name, author=self.user, image=name)
+                 for name in names]
+        Post.objects.create(text='missing', author=self.user,
+                            image='posts/missing.png')
+
+        out = StringIO()
+        call_command('migrate_media', stdout=out)
+        self.assertIn('Перенесено файлов: 2, различных: 1, не найдено: 1',
+                      out.getvalue())
+        for post in posts:
+            post.refresh_from_db()
+            self.assertRegex(post.image.name, r'^posts/[0-9a-f]{64}\.png$')
+            self.assertEqual(post.version, 2)
+        self.assertEqual(self.references(posts[0].image.name), 2)
+        for name in names:
+            self.assertFalse(storage.exists(name))
+
+        out = StringIO()
+        call_command('migrate_media', stdout=out)
+        self.assertIn('Перенесено файлов: 0', out.getvalue())
+
+
+class YatubeConditionalGetTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.reader = User.objects.create_user(
+            username='Subscribed', email='sub@skynet.com',
+            password='qwerty123'
+        )
+        self.group = Group.objects.create(
+            description='test_group',
+            title='test',
+            slug='test_slug'
+        )
+        self.post = Post.objects.create(
+            text='post', author=self.user, group=self.group)
+        self.urls = (
+            reverse('index'),
+            reverse('group_posts', kwargs={'slug': self.group.slug}),
+            reverse('profile', kwargs={'username': self.user.username}),
+            reverse('post', kwargs={
+                'username': self.user.username, 'post_id': self.post.pk}),
+        )
+
+    def assertRevalidates(self, changed):
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        changed()
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_unchanged_page_not_rendered(self):
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                with CaptureQueriesContext(connection) as queries:
+                    response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response.templates, [])
+                self.assertLessEqual(len(queries), 2)
+
+    def test_edit_and_comment_change_etag(self):
+        def edit():
+            self.post.text = 'edited'
+            self.post.save()
+        self.assertRevalidates(edit)
+        self.assertRevalidates(lambda: Comment.objects.create(
+            post=self.post, author=self.reader, text='c'))
+
+    def test_change_unseen_by_feed_cache_revalidates(self):
+        # правка из другого процесса: поколения локального кэша не растут
+        def edit():
+            Post.objects.filter(pk=self.post.pk).update(
+                text='edited elsewhere', version=F('version') + 1)
+        self.assertRevalidates(edit)
+        for url in self.urls[:3]:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'edited elsewhere')
+
+    def test_viewer_and_follow_change_etag(self):
+        url = self.urls[2]
+        etag = self.client.get(url)['ETag']
+        self.client.force_login(self.reader)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Cookie', response['Vary'])
+
+        etag = response['ETag']
+        self.client.get(reverse('profile_follow', args=['Osol']))
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Отписаться')
+
+    def test_benchmark_command(self):
+        out = StringIO()
+        call_command('bench_conditional_get', requests=2, stdout=out)
+        for url in self.urls:
+            self.assertIn(url, out.getvalue())
+
+
+class YatubeTemplatePreloadTest(TestCase):
+
+    def setUp(self):
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.post = Post.objects.create(text='preloaded', author=self.user)
+        Comment.objects.create(post=self.post, author=self.user, text='c1')
+
+    def test_project_templates_compile(self):
+        templates, errors = templating.compile_all()
+        self.assertEqual(errors, [])
+        self.assertIn('post.html', templates)
+        self.assertIn('include/comment_items.html', templates)
+
+    def test_check_reports_broken_template(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with open(os.path.join(directory, 'broken.html'), 'w') as file:
+            file.write('{% if %}')
+        with override_settings(TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [directory],
+        }]):
+            errors = templating.check_templates()
+        self.assertEqual([error.id for error in errors], ['yatube.E001'])
+        self.assertIn('broken.html', errors[0].msg)
+
+    def test_preload_binds_constant_includes(self):
+        self.assertGreater(templating.preload(), 0)
+        engine = Engine.get_default()
+        template = engine.get_template('post.html')
+        includes = template.nodelist.get_nodes_by_type(IncludeNode)
+        self.assertTrue(includes)
+        for node in includes:
+            self.assertIsInstance(node.template, templating.CompiledInclude)
+        response = self.client.get(reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.id
+        }))
+        self.assertContains(response, 'preloaded')
+        self.assertContains(response, 'c1')
+
+    def test_no_preload_without_cached_loader(self):
+        with override_settings(TEMPLATES=[{
+            'BACKEND': 'django.template.backends.django.DjangoTemplates',
+            'DIRS': [settings.TEMPLATES_DIR],
+            'APP_DIRS': True,
+            'OPTIONS': {'debug': True},
+        }]):
+            self.assertEqual(templating.preload(), 0)
+
+
+class YatubeEnvironmentTest(SimpleTestCase):
+
+    def load_settings(self, environment, **env):
+        with mock.patch.dict(os.environ, {'YATUBE_ENV': environment, **env}):
+            return runpy.run_path(settings.BASE_DIR + '/yatube/settings.py')
+
+    def test_prod_has_no_debug_toolbar(self):
+        prod = self.load_settings('prod')
+        self.assertFalse(prod['DEBUG'])
+        self.assertNotIn('debug_toolbar', prod['INSTALLED_APPS'])
+        self.assertFalse([name for name in prod['MIDDLEWARE']
+                          if name.startswith('debug_toolbar')])
+        self.assertTrue(prod['TEMPLATE_PRELOAD'])
+
+    def test_dev_has_debug_toolbar(self):
+        dev = self.load_settings('dev')
+        self.assertTrue(dev['DEBUG'])
+        self.assertIn('debug_toolbar', dev['INSTALLED_APPS'])
+        self.assertIn('debug_toolbar.middleware.DebugToolbarMiddleware',
+                      dev['MIDDLEWARE'])
+        self.assertFalse(dev['TEMPLATE_PRELOAD'])
+
+    def test_test_environment(self):
+        test = self.load_settings('test')
+        self.assertFalse(test['DEBUG'])
+        self.assertNotIn('debug_toolbar', test['INSTALLED_APPS'])
+        self.assertEqual(test['PASSWORD_HASHERS'],
+                         ['django.contrib.auth.hashers.MD5PasswordHasher'])
+
+    def test_process_local_cache_caps_feed_ttl(self):
+        local = self.load_settings('prod', YATUBE_CACHE='locmem')
+        self.assertLessEqual(local['FEED_CACHE_TTL'], 20)
+        self.assertLessEqual(local['FEED_CACHE_STALE_TTL'], 20)
+        shared = self.load_settings('prod', YATUBE_CACHE='sqlite')
+        self.assertEqual(shared['FEED_CACHE_TTL'], 300)
+        self.assertEqual(shared['FEED_CACHE_STALE_TTL'], 3600)
+
+    def test_unknown_environment(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.load_settings('staging')
+
+    def test_no_debug_urls_outside_dev(self):
+        with self.assertRaises(NoReverseMatch):
+            reverse('djdt:render_panel')
+
+
+class YatubeSQLiteProfileTest(SimpleTestCase):
+    """Профиль tuned под конкурентной записью на файловой базе."""
+    writers = 8
+    readers = 4
+    writes = 25
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        connections.databases['stress'] = {
+            **settings.DB_PROFILES['tuned'],
+            'NAME': os.path.join(directory, 'stress.sqlite3'),
+        }
+        connections.ensure_defaults('stress')
+        connections.prepare_test_settings('stress')
+        self.addCleanup(connections.databases.pop, 'stress')
+        self.addCleanup(connections.__delitem__, 'stress')
+        self.addCleanup(lambda: connections['stress'].close())
+        with connections['stress'].cursor() as cursor:
+            cursor.execute(
+                'CREATE TABLE entry (id INTEGER PRIMARY KEY, number INTEGER)')
+
+    def test_pragmas_applied(self):
+        with connections['stress'].cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+    def test_concurrent_writes_and_reads(self):
+        errors = []
+        done = threading.Event()
+
+        def write():
+            try:
+                for _ in range(self.writes):
+                    # чтение, затем запись в одной транзакции — как в
+                    # new_post/add_comment; с DEFERRED это «database is
+                    # locked» без ожидания
+                    with transaction.atomic(using='stress'):
+                        with connections['stress'].cursor() as cursor:
+                            cursor.execute('SELECT COUNT(*) FROM entry')
+                            count = cursor.fetchone()[0]
+                            cursor.execute(
+                                'INSERT INTO entry (number) VALUES (%s)',
+                                [count]
+                            )
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections['stress'].close()
+
+        def read():
+            try:
+                while not done.is_set():
+                    with connections['stress'].cursor() as cursor:
+                        cursor.execute('SELECT COUNT(*) FROM entry')
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connections['stress'].close()
+
+        readers = [threading.Thread(target=read)
+                   for _ in range(self.readers)]
+        writers = [threading.Thread(target=write)
+                   for _ in range(self.writers)]
+        for thread in readers + writers:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        for thread in readers:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        with connections['stress'].cursor() as cursor:
+            cursor.execute('SELECT COUNT(*), COUNT(DISTINCT number) '
+                           'FROM entry')
+            total, distinct = cursor.fetchone()
+        self.assertEqual(total, self.writers * self.writes)
+        # транзакции записи шли строго по очереди
+        self.assertEqual(distinct, total)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'])
+class YatubeReplicaRoutingTest(TransactionTestCase):
+    """Реплика — отдельный файл SQLite, который тест синхронизирует сам.
+
+    Пока реплика не синхронизирована, её отставание видно снаружи.
+    """
+
+    def setUp(self):
+        cache.clear()
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        connections.databases['replica'] = {
+            **connections.databases['default'],
+            'NAME': os.path.join(directory, 'replica.sqlite3'),
+        }
+        connections.ensure_defaults('replica')
+        connections.prepare_test_settings('replica')
+        self.addCleanup(connections.databases.pop, 'replica')
+        self.addCleanup(connections.__delitem__, 'replica')
+        self.addCleanup(lambda: connections['replica'].close())
+
+        self.client = Client()
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.post = Post.objects.create(text='synced', author=self.user)
+        replicas.sync('default', 'replica')
+        self.post_url = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': self.post.pk})
+
+    def test_read_views_use_replica(self):
+        new_post = Post.objects.create(text='lagging', author=self.user)
+        url = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': new_post.pk})
+        self.assertEqual(self.client.get(url).status_code, 404)
+        self.assertEqual(self.client.get(self.post_url).status_code, 200)
+        replicas.sync('default', 'replica')
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_feed_cache_filled_from_primary(self):
+        Post.objects.create(text='lagging', author=self.user)
+        self.assertContains(self.client.get(reverse('index')), 'lagging')
+
+    def test_read_your_writes_after_post(self):
+        self.client.force_login(self.user)
+        replicas.sync('default', 'replica')
+        response = self.client.post(
+            reverse('new_post'), {'text': 'my own post'})
+        self.assertIn(STICKY_COOKIE, response.cookies)
+        new_post = Post.objects.get(text='my own post')
+        url = reverse('post', kwargs={
+            'username': self.user.username, 'post_id': new_post.pk})
+        self.assertEqual(self.client.get(url).status_code, 200)
+
+        other = Client()
+        self.assertEqual(other.get(url).status_code, 404)
@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+
+from jobs.registry import task
+
+from .models import Follow, Post, TimelineEntry, UserStats
+
+
+def is_enabled():
+    return settings.TIMELINE_FANOUT
+
+
+def is_celebrity(author_id):
+    """Авторам с огромной аудиторией ленты не раздаются.
+
+    Их записи подмешиваются в ленту подписчика при чтении.
+    """
+    followers = UserStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', flat=True
+    ).first()
+    return (followers or 0) > settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+
+
+def trim(user_ids):
+    """Обрезать ленты до TIMELINE_LENGTH одним DELETE на всех.
+
+    Удаляется всё, что старше TIMELINE_LENGTH-й записи ленты того же
+    пользователя; записи с той же датой, что у последней, остаются.
+    """
+    cutoff = (
+        TimelineEntry.objects.filter(user=OuterRef('user'))
+        .order_by('-pub_date', '-post_id')
+        .values('pub_date')[settings.TIMELINE_LENGTH - 1:
+                            settings.TIMELINE_LENGTH]
+    )
+    TimelineEntry.objects.filter(
+        user_id__in=user_ids,
+        pub_date__lt=Subquery(cutoff),
+    ).delete()
+
+
+def fan_out(post):
+    if not is_enabled():
+        return
+    followers = UserStats.objects.filter(user_id=post.author_id).values_list(
+        'followers_count', flat=True
+    ).first() or 0
+    if followers > settings.TIMELINE_FANOUT_MAX_FOLLOWERS:
+        return
+    if followers > settings.TIMELINE_FANOUT_INLINE_MAX:
+        fan_out_post.delay(post.pk)
+        return
+    _fan_out(post)
+
+
+@task
+def fan_out_post(post_id):
+    post = Post.objects.filter(pk=post_id).first()
+    if post is not None:
+        _fan_out(post)
+
+
+def _fan_out(post):
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post=post, pub_date=post.pub_date)
+            for user_id in follower_ids
+        ],
+        ignore_conflicts=True,
+    )
+    trim(follower_ids)
+
+
+def backfill(user_id, author_id):
+    if not is_enabled() or is_celebrity(author_id):
+        return
+    posts = (
+        Post.objects.filter(author_id=author_id)
+        .order_by('-pub_date', '-id')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+    trim([user_id])
+
+
+def evict(user_id, author_id):
+    TimelineEntry.objects.filter(
+        user_id=user_id,
+        post__author_id=author_id
+    ).delete()
+
+
+def rebuild(user_id):
+    """Собрать ленту заново одним запросом по всем подпискам."""
+    TimelineEntry.objects.filter(user_id=user_id).delete()
+    posts = (
+        Post.objects.filter(
+            author__following__user_id=user_id,
+            author__stats__followers_count__lte=(
+                settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+            ),
+        )
+        .order_by('-pub_date', '-id')
+        .values_list('pk', 'pub_date')[:settings.TIMELINE_LENGTH]
+    )
+    TimelineEntry.objects.bulk_create(
+        [
+            TimelineEntry(user_id=user_id, post_id=pk, pub_date=pub_date)
+            for pk, pub_date in posts
+        ],
+        ignore_conflicts=True,
+    )
+
+
+def followed_posts(user):
+    """Лента подписок пользователя.
+
+    Без раздачи при записи лента собирается соединением с подписками.
+    С раздачей записи читаются из материализованной ленты, а записи
+    авторов-знаменитостей подтягиваются в момент чтения.
+    """
+    posts = Post.objects.feed()
+    if not is_enabled():
+        return posts.filter(author__following__user=user)
+    celebrities = Follow.objects.filter(
+        user=user,
+        author__stats__followers_count__gt=(
+            settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+        ),
+    ).values('author')
+    if not celebrities.exists():
+        return posts.filter(timeline_entries__user=user)
+    return posts.filter(
+        Q(pk__in=TimelineEntry.objects.filter(user=user).values('post'))
+        | Q(author__in=celebrities)
+    )
@@ -0,0 +1,24 @@
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """Пишет загружаемый файл кусками сразу во временный файл.
+
+    Файл не собирается в памяти целиком даже при малом размере, а
+    загрузка больше FILE_UPLOAD_MAX_SIZE обрывается ответом 400, как
+    Django поступает с DATA_UPLOAD_MAX_MEMORY_SIZE.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > settings.FILE_UPLOAD_MAX_SIZE:
+            self.file.close()
+            raise RequestDataTooBig(
+                'Загружаемый файл больше FILE_UPLOAD_MAX_SIZE.')
+        return super().receive_data_chunk(raw_data, start)
@@ -14,6 +14,11 @@ urlpatterns = [
         views.post_edit,
         name='post_edit'
         ),
+    path(
+        '<username>/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     path(
         '<username>/<int:post_id>/comment',
         views.add_comment,
@@ -1,62 +1,100 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.shortcuts import redirect, render, get_object_or_404
 from django.contrib.auth.decorators import login_required
-from django.views.decorators.cache import cache_page
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.utils.http import urlencode
+from django.views.decorators.http import require_safe
+from . import conditional, feed_cache, images, timeline
 from .forms import PostForm, CommentForm
-from .models import Post, Group, Follow
-from django.core.paginator import Paginator
+from .models import Post, Group, Follow, UserStats
+from .paginator import CursorPaginator
 
 
 User = get_user_model()
 
 
-@cache_page(20)
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(request, 'index.html', {
+    post_list = Post.objects.feed()
+    paginator = CursorPaginator(post_list, 10)
+    state = conditional.feed_state(paginator, request)
+    etag = conditional.page_etag(request, state)
+    response = conditional.not_modified(request, etag)
+    if response is not None:
+        return response
+    page = feed_cache.get_page('index', paginator, request, state)
+    return conditional.with_etag(render(request, 'index.html', {
         'page': page,
         'paginator': paginator,
-        'post': post_list})
+        'post': post_list}), etag)
 
 
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.filter(group=group)
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return render(
+    scope = feed_cache.group_scope(group.pk)
+    posts = group.posts.feed()
+    paginator = CursorPaginator(posts, 10)
+    state = conditional.feed_state(paginator, request)
+    etag = conditional.page_etag(
+        request, state, group.title, group.description)
+    response = conditional.not_modified(request, etag)
+    if response is not None:
+        return response
+    page = feed_cache.get_page(scope, paginator, request, state)
+    return conditional.with_etag(render(
         request,
         'group.html',
         {'group': group, 'post': posts, 'page': page, 'paginator': paginator}
-    )
+    ), etag)
 
 
 @login_required
+@transaction.atomic
 def new_post(request):
     form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         user_post = form.save(commit=False)
         user_post.author = request.user
         user_post.save()
+        images.schedule_processing(user_post)
         return redirect('index')
     return render(request, 'new_post.html', {'is_edit': False, 'form': form})
 
 
+def followed_by(user, author):
+    """Подзапрос «user подписан на author» для аннотации is_followed."""
+    return Exists(Follow.objects.filter(user=user, author=author))
+
+
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    post_list = author.posts.all()
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = request.user.is_authenticated and Follow.objects.filter(
-            user=request.user,
-            author=author
-    ).exists()
-    return render(
+    authors = User.objects.select_related('stats')
+    if request.user.is_authenticated:
+        authors = authors.annotate(
+            is_followed=followed_by(request.user, OuterRef('pk')))
+    author = get_object_or_404(authors, username=username)
+    following = getattr(author, 'is_followed', False)
+    stats = UserStats.of(author)
+    scope = feed_cache.author_scope(author.pk)
+    post_list = author.posts.feed()
+    paginator = CursorPaginator(post_list, 10)
+    state = conditional.feed_state(paginator, request)
+    etag = conditional.page_etag(
+        request,
+        state,
+        author.get_full_name(),
+        stats.followers_count,
+        stats.following_count,
+        stats.posts_count,
+        following,
+    )
+    response = conditional.not_modified(request, etag)
+    if response is not None:
+        return response
+    page = feed_cache.get_page(scope, paginator, request, state)
+    return conditional.with_etag(render(
         request,
         'profile.html',
         {
@@ -66,24 +104,94 @@ def profile(request, username):
             'paginator': paginator,
             'following': following
         }
+    ), etag)
+
+
+def comment_paginator(post):
+    """Комментарии записи по курсору, новые сверху.
+
+    Сервер никогда не рендерит больше COMMENTS_PAGE_SIZE комментариев:
+    остальные подгружаются страницами через post_comments.
+    """
+    return CursorPaginator(
+        post.comments.select_related('author'),
+        settings.COMMENTS_PAGE_SIZE,
+        ordering=('-created', '-id'),
     )
 
 
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
-    author = get_object_or_404(User, username=username)
-    post_list = post.author.posts.all()
+    # запись, автор со счётчиками, группа и подписка — одним запросом
+    posts = Post.objects.select_related('author__stats', 'group')
+    if request.user.is_authenticated:
+        posts = posts.annotate(
+            is_followed=followed_by(request.user, OuterRef('author')))
+    post = get_object_or_404(posts, pk=post_id, author__username=username)
+    author = post.author
+    following = getattr(post, 'is_followed', False)
+    stats = UserStats.of(author)
+    # версия записи растёт с каждой правкой и комментарием
+    etag = conditional.page_etag(
+        request,
+        post.pk,
+        post.version,
+        author.get_full_name(),
+        stats.followers_count,
+        stats.following_count,
+        stats.posts_count,
+        following,
+    )
+    response = conditional.not_modified(request, etag)
+    if response is not None:
+        return response
     form = CommentForm()
-    comment_list = post.comments.all()
-    return render(
+    paginator = comment_paginator(post)
+    comments = paginator.get_page(request)
+    return conditional.with_etag(render(
         request,
         'post.html',
         {'author': author,
          'post': post,
-         'posts': post_list,
-         'comments': comment_list,
+         'comments': comments,
+         'comment_list': paginator.queryset,
+         'following': following,
          'form': form}
+    ), etag)
+
+
+@require_safe
+def post_comments(request, username, post_id):
+    """Следующая страница комментариев для подгрузки на странице записи.
+
+    Отдаёт HTML-фрагмент, а с `?format=json` — разметку комментариев и
+    адрес следующей страницы.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        pk=post_id,
+        author__username=username
     )
+    as_json = request.GET.get('format') == 'json'
+    etag = conditional.page_etag(request, post.pk, post.version, as_json)
+    response = conditional.not_modified(request, etag)
+    if response is not None:
+        return response
+    comments = comment_paginator(post).get_page(request)
+    if not as_json:
+        return conditional.with_etag(render(
+            request,
+            'include/comment_page.html',
+            {'post': post, 'comments': comments}
+        ), etag)
+    next_url = None
+    if comments.has_next():
+        next_url = '{}?{}'.format(request.path, urlencode(
+            {'after': comments.next_cursor, 'format': 'json'}))
+    return conditional.with_etag(JsonResponse({
+        'html': render_to_string(
+            'include/comment_items.html', {'comments': comments}, request),
+        'next': next_url,
+    }), etag)
 
 
 @login_required
@@ -96,7 +204,9 @@ def post_edit(request, username, post_id):
         files=request.FILES or None,
         instance=post)
     if form.is_valid():
-        form.save()
+        post = form.save()
+        if 'image' in form.changed_data:
+            images.schedule_processing(post)
         return redirect('post', username=username, post_id=post_id)
     return render(
         request,
@@ -106,9 +216,13 @@ def post_edit(request, username, post_id):
 
 
 @login_required
+@transaction.atomic
 def add_comment(request, username, post_id):
-    post = get_object_or_404(Post, pk=post_id, author__username=username)
-    comments = post.comments.all()
+    post = get_object_or_404(
+        Post.objects.select_related('author'),
+        pk=post_id,
+        author__username=username
+    )
     form = CommentForm(request.POST or None)
     if form.is_valid():
         new_comment = form.save(commit=False)
@@ -119,16 +233,19 @@ def add_comment(request, username, post_id):
     return render(
         request,
         'include/comments.html',
-        {'form': form, 'post': post, 'comments': comments}
+        {
+            'form': form,
+            'post': post,
+            'comments': comment_paginator(post).get_page(request)
+        }
     )
 
 
 @login_required
 def follow_index(request):
-    post = Post.objects.select_related('author').filter(author__following__user=request.user)
-    paginator = Paginator(post, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    post = timeline.followed_posts(request.user)
+    paginator = CursorPaginator(post, 10)
+    page = paginator.get_page(request)
     return render(
         request,
         "follow.html",
@@ -137,6 +254,7 @@ def follow_index(request):
 
 
 @login_required
+@transaction.atomic
 def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     subscribe_exist = Follow.objects.filter(
@@ -148,6 +266,7 @@ def profile_follow(request, username):
 
 
 @login_required
+@transaction.atomic
 def profile_unfollow(request, username):
     author = get_object_or_404(User, username=username)
     following = Follow.objects.filter(
@@ -0,0 +1,177 @@
+"""Хранилища поискового индекса.
+
+Оба бэкенда принимают уже нормализованные термы (см. stemmer.terms) и
+возвращают попадания, отсортированные по убыванию релевантности.
+"""
+import math
+from collections import Counter, namedtuple
+
+from django.db import connection
+from django.db.models import Count, Max
+
+from posts.models import Comment, Post
+
+from .models import IndexedTerm
+
+Hit = namedtuple('Hit', 'doc_type doc_id post_id score')
+
+DOC_TYPES = (IndexedTerm.POST, IndexedTerm.COMMENT)
+
+
+class FTS5Backend:
+    """Виртуальная таблица SQLite FTS5 с ранжированием BM25.
+
+    В таблицу пишется уже приведённый к основам текст, поэтому встроенный
+    токенизатор только делит его по пробелам. rowid кодирует документ:
+    `id * 2 + тип`, что позволяет удалять документ без полного прохода.
+    """
+    table = 'search_fts'
+
+    @staticmethod
+    def rowid(doc_type, doc_id):
+        return doc_id * 2 + DOC_TYPES.index(doc_type)
+
+    def index(self, doc_type, doc_id, post_id, terms):
+        rowid = self.rowid(doc_type, doc_id)
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s', [rowid])
+            if terms:
+                cursor.execute(
+                    f'INSERT INTO {self.table} '
+                    '(rowid, body, doc_type, post_id) VALUES (%s, %s, %s, %s)',
+                    [rowid, ' '.join(terms), doc_type, post_id]
+                )
+
+    def index_many(self, documents):
+        """Добавить документы (doc_type, doc_id, post_id, terms) в пустой
+        индекс без предварительного удаления.
+        """
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f'INSERT INTO {self.table} '
+                '(rowid, body, doc_type, post_id) VALUES (%s, %s, %s, %s)',
+                [
+                    [self.rowid(doc_type, doc_id), ' '.join(terms),
+                     doc_type, post_id]
+                    for doc_type, doc_id, post_id, terms in documents
+                    if terms
+                ]
+            )
+
+    def remove(self, doc_type, doc_id):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} WHERE rowid = %s',
+                [self.rowid(doc_type, doc_id)]
+            )
+
+    def clear(self):
+        with connection.cursor() as cursor:
+            cursor.execute(f'DELETE FROM {self.table}')
+
+    def search(self, terms, doc_type=None, limit=100):
+        match = ' '.join('"{}"'.format(term.replace('"', '""'))
+                         for term in terms)
+        sql = (
+            f'SELECT rowid, doc_type, post_id, bm25({self.table}) AS rank '
+            f'FROM {self.table} WHERE {self.table} MATCH %s'
+        )
+        params = [match]
+        if doc_type is not None:
+            sql += ' AND doc_type = %s'
+            params.append(doc_type)
+        sql += ' ORDER BY rank LIMIT %s'
+        params.append(limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        # bm25() отрицателен: чем меньше, тем релевантнее
+        return [
+            Hit(found_type, rowid // 2, post_id, -rank)
+            for rowid, found_type, post_id, rank in rows
+        ]
+
+
+class InvertedIndexBackend:
+    """Обратный индекс в обычной таблице и ранжирование TF-IDF.
+
+    Документ должен содержать все термы запроса. Кандидаты берутся по
+    самому редкому терму, остальные термы проверяются только для них.
+    """
+    # насыщение частоты терма, как k1 в BM25
+    saturation = 1.2
+
+    @staticmethod
+    def document_count():
+        """Оценка числа документов для IDF по наибольшим id.
+
+        COUNT(*) прошёл бы обе таблицы целиком на каждый поиск, а max(id)
+        берётся из первичного ключа. Удалённые документы лишь немного
+        завышают оценку и почти не меняют веса термов относительно друг
+        друга.
+        """
+        return sum(
+            model.objects.aggregate(last=Max('pk'))['last'] or 0
+            for model in (Post, Comment)
+        )
+
+    def index(self, doc_type, doc_id, post_id, terms):
+        self.remove(doc_type, doc_id)
+        IndexedTerm.objects.bulk_create([
+            IndexedTerm(term=term[:100], doc_type=doc_type, doc_id=doc_id,
+                        post_id=post_id, frequency=frequency)
+            for term, frequency in Counter(terms).items()
+        ])
+
+    def index_many(self, documents):
+        IndexedTerm.objects.bulk_create(
+            IndexedTerm(term=term[:100], doc_type=doc_type, doc_id=doc_id,
+                        post_id=post_id, frequency=frequency)
+            for doc_type, doc_id, post_id, terms in documents
+            for term, frequency in Counter(terms).items()
+        )
+
+    def remove(self, doc_type, doc_id):
+        IndexedTerm.objects.filter(doc_type=doc_type, doc_id=doc_id).delete()
+
+    def clear(self):
+        IndexedTerm.objects.all().delete()
+
+    def search(self, terms, doc_type=None, limit=100):
+        terms = sorted({term[:100] for term in terms})
+        entries = IndexedTerm.objects.all()
+        if doc_type is not None:
+            entries = entries.filter(doc_type=doc_type)
+        document_frequency = dict(
+            entries.filter(term__in=terms).values('term')
+            .annotate(documents=Count('id')).order_by()
+            .values_list('term', 'documents')
+        )
+        if len(document_frequency) < len(terms):
+            return []
+        total = self.document_count()
+        rarest = min(terms, key=document_frequency.__getitem__)
+        candidates = entries.filter(term=rarest).values_list(
+            'doc_type', 'doc_id')
+
+        scores = Counter()
+        matched = Counter()
+        posts = {}
+        rows = entries.filter(term__in=terms).filter(
+            doc_id__in=candidates.values('doc_id')
+        ).values_list('term', 'doc_type', 'doc_id', 'post_id', 'frequency')
+        candidate_set = set(candidates)
+        for term, found_type, doc_id, post_id, frequency in rows:
+            key = (found_type, doc_id)
+            if key not in candidate_set:
+                continue
+            idf = math.log(1 + total / document_frequency[term])
+            scores[key] += idf * frequency / (frequency + self.saturation)
+            matched[key] += 1
+            posts[key] = post_id
+        return [
+            Hit(found_type, doc_id, posts[(found_type, doc_id)], score)
+            for (found_type, doc_id), score in scores.most_common()
+            if matched[(found_type, doc_id)] == len(terms)
+        ][:limit]
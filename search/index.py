@@ -0,0 +1,97 @@
+import itertools
+
+from django.conf import settings
+from django.db import connection
+
+from posts.models import Comment, Post
+
+from .backends import FTS5Backend, InvertedIndexBackend
+from .models import IndexedTerm
+from .stemmer import terms
+
+# попадание в комментарии весит меньше, чем в тексте самой записи
+COMMENT_WEIGHT = 0.5
+
+_fts5_tables = {}
+
+
+def _has_fts5_table():
+    if connection.vendor != 'sqlite':
+        return False
+    name = connection.settings_dict['NAME']
+    if name not in _fts5_tables:
+        _fts5_tables[name] = (
+            FTS5Backend.table in connection.introspection.table_names())
+    return _fts5_tables[name]
+
+
+def get_backend():
+    """Бэкенд из настройки SEARCH_BACKEND: fts5, inverted или auto."""
+    choice = settings.SEARCH_BACKEND
+    if choice == 'fts5' or choice == 'auto' and _has_fts5_table():
+        return FTS5Backend()
+    return InvertedIndexBackend()
+
+
+def index_post(post):
+    get_backend().index(IndexedTerm.POST, post.pk, post.pk, terms(post.text))
+
+
+def index_comment(comment):
+    get_backend().index(IndexedTerm.COMMENT, comment.pk, comment.post_id,
+                        terms(comment.text))
+
+
+def remove_post(post_id):
+    get_backend().remove(IndexedTerm.POST, post_id)
+
+
+def remove_comment(comment_id):
+    get_backend().remove(IndexedTerm.COMMENT, comment_id)
+
+
+def _documents(batch_size):
+    for post in Post.objects.only('text').iterator(chunk_size=batch_size):
+        yield IndexedTerm.POST, post.pk, post.pk, terms(post.text)
+    for comment in Comment.objects.only('text', 'post_id').iterator(
+            chunk_size=batch_size):
+        yield IndexedTerm.COMMENT, comment.pk, comment.post_id, terms(
+            comment.text)
+
+
+def rebuild(batch_size=2000):
+    backend = get_backend()
+    backend.clear()
+    indexed = 0
+    documents = _documents(batch_size)
+    while True:
+        batch = list(itertools.islice(documents, batch_size))
+        if not batch:
+            return indexed
+        backend.index_many(batch)
+        indexed += len(batch)
+
+
+def search_ids(query, doc_type, limit=None):
+    """id документов одного типа в порядке релевантности."""
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+    hits = get_backend().search(
+        query_terms, doc_type, limit or settings.SEARCH_MAX_RESULTS)
+    return [hit.doc_id for hit in hits]
+
+
+def search_posts(query, limit=None):
+    """id записей, найденных по тексту записи или её комментариев."""
+    query_terms = terms(query)
+    if not query_terms:
+        return []
+    limit = limit or settings.SEARCH_MAX_RESULTS
+    scores = {}
+    for hit in get_backend().search(query_terms, limit=limit * 2):
+        score = hit.score
+        if hit.doc_type == IndexedTerm.COMMENT:
+            score *= COMMENT_WEIGHT
+        scores[hit.post_id] = max(score, scores.get(hit.post_id, score))
+    return sorted(scores, key=scores.__getitem__, reverse=True)[:limit]
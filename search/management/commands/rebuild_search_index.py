@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from search import index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс записей и комментариев'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            indexed = index.rebuild()
+        self.stdout.write(self.style.SUCCESS(
+            f'Поисковый индекс перестроен, документов: {indexed}'
+        ))
@@ -0,0 +1,61 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fts5_available(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA compile_options')
+        options = {row[0] for row in cursor.fetchall()}
+    return 'ENABLE_FTS5' in options
+
+
+def create_fts_table(apps, schema_editor):
+    if fts5_available(schema_editor.connection):
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5("
+            "body, doc_type UNINDEXED, post_id UNINDEXED, "
+            "tokenize='unicode61 remove_diacritics 0')"
+        )
+
+
+def drop_fts_table(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE IF EXISTS search_fts')
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('posts', '0011_post_thumbnail'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='IndexedTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='Терм')),
+                ('doc_type', models.CharField(choices=[('post', 'Запись'), ('comment', 'Комментарий')], max_length=10, verbose_name='Тип документа')),
+                ('doc_id', models.PositiveIntegerField(verbose_name='Документ')),
+                ('frequency', models.PositiveIntegerField(verbose_name='Вхождений')),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='posts.Post')),
+            ],
+            options={
+                'verbose_name': 'Терм индекса',
+                'verbose_name_plural': 'Термы индекса',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='indexedterm',
+            index=models.Index(fields=['term'], name='search_term_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='indexedterm',
+            index=models.Index(fields=['doc_type', 'doc_id'], name='search_doc_idx'),
+        ),
+        migrations.RunPython(create_fts_table, drop_fts_table),
+    ]
@@ -0,0 +1,36 @@
+from django.db import models
+
+from posts.models import Post
+
+
+class IndexedTerm(models.Model):
+    """Запись обратного индекса: терм и документ, в котором он встречается.
+
+    Используется, когда база не умеет FTS5.
+    """
+    POST = 'post'
+    COMMENT = 'comment'
+    DOC_TYPES = (
+        (POST, 'Запись'),
+        (COMMENT, 'Комментарий'),
+    )
+
+    term = models.CharField('Терм', max_length=100)
+    doc_type = models.CharField('Тип документа', max_length=10,
+                                choices=DOC_TYPES)
+    doc_id = models.PositiveIntegerField('Документ')
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='+')
+    frequency = models.PositiveIntegerField('Вхождений')
+
+    class Meta:
+        verbose_name = 'Терм индекса'
+        verbose_name_plural = 'Термы индекса'
+        indexes = [
+            models.Index(fields=['term'], name='search_term_idx'),
+            models.Index(fields=['doc_type', 'doc_id'],
+                         name='search_doc_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.term} → {self.doc_type}:{self.doc_id}'
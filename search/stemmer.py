@@ -0,0 +1,135 @@
+"""Стеммер Snowball для русского языка и разбиение текста на термы."""
+import re
+from functools import lru_cache
+
+VOWELS = 'аеиоуыэюя'
+
+PERFECTIVE_GERUND_1 = ('в', 'вши', 'вшись')
+PERFECTIVE_GERUND_2 = ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись')
+ADJECTIVE = (
+    'ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый', 'ой', 'ем',
+    'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому', 'их', 'ых', 'ую', 'юю',
+    'ая', 'яя', 'ою', 'ею',
+)
+PARTICIPLE_1 = ('ем', 'нн', 'вш', 'ющ', 'щ')
+PARTICIPLE_2 = ('ивш', 'ывш', 'ующ')
+REFLEXIVE = ('ся', 'сь')
+VERB_1 = (
+    'ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но', 'ет',
+    'ют', 'ны', 'ть', 'ешь', 'нно',
+)
+VERB_2 = (
+    'ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей', 'уй',
+    'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят', 'ует', 'уют',
+    'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю',
+)
+NOUN = (
+    'а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи', 'ии', 'и',
+    'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием', 'ем', 'ам', 'ом', 'о',
+    'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию', 'ью', 'ю', 'ия', 'ья', 'я',
+)
+SUPERLATIVE = ('ейше', 'ейш')
+DERIVATIONAL = ('ость', 'ост')
+
+WORD_RE = re.compile(r'\w+')
+CYRILLIC_RE = re.compile('[а-я]')
+
+
+def _by_length(endings):
+    return sorted(endings, key=len, reverse=True)
+
+
+def _remove(word, endings, after_a_ya=False):
+    """Отрезать самое длинное окончание; None, если ни одно не подошло.
+
+    Для окончаний первой группы перед ними должна стоять «а» или «я».
+    """
+    for ending in _by_length(endings):
+        if word.endswith(ending):
+            stem = word[:-len(ending)]
+            if after_a_ya and not stem.endswith(('а', 'я')):
+                continue
+            return stem
+    return None
+
+
+def _remove_group(word, first, second):
+    candidates = [
+        stem for stem in (
+            _remove(word, first, after_a_ya=True),
+            _remove(word, second),
+        ) if stem is not None
+    ]
+    return min(candidates, key=len) if candidates else None
+
+
+def _region_start(word, start=0):
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+# словарь живого текста невелик, а слова повторяются постоянно
+@lru_cache(maxsize=100000)
+def stem(word):
+    word = word.lower().replace('ё', 'е')
+    rv_start = next(
+        (index + 1 for index, char in enumerate(word) if char in VOWELS),
+        len(word)
+    )
+    r2_start = _region_start(word, _region_start(word))
+    prefix, rv = word[:rv_start], word[rv_start:]
+
+    # шаг 1
+    result = _remove_group(rv, PERFECTIVE_GERUND_1, PERFECTIVE_GERUND_2)
+    if result is None:
+        reflexive = _remove(rv, REFLEXIVE)
+        if reflexive is not None:
+            rv = reflexive
+        result = _remove(rv, ADJECTIVE)
+        if result is not None:
+            participle = _remove_group(result, PARTICIPLE_1, PARTICIPLE_2)
+            if participle is not None:
+                result = participle
+        else:
+            result = _remove_group(rv, VERB_1, VERB_2)
+            if result is None:
+                result = _remove(rv, NOUN)
+    if result is not None:
+        rv = result
+
+    # шаг 2
+    if rv.endswith('и'):
+        rv = rv[:-1]
+
+    # шаг 3: словообразовательные окончания только в R2
+    for ending in DERIVATIONAL:
+        if rv.endswith(ending) and (
+                len(prefix) + len(rv) - len(ending) >= r2_start):
+            rv = rv[:-len(ending)]
+            break
+
+    # шаг 4
+    if rv.endswith('нн'):
+        rv = rv[:-1]
+    else:
+        superlative = _remove(rv, SUPERLATIVE)
+        if superlative is not None:
+            rv = superlative
+            if rv.endswith('нн'):
+                rv = rv[:-1]
+        elif rv.endswith('ь'):
+            rv = rv[:-1]
+    return prefix + rv
+
+
+def terms(text):
+    """Нормализованные термы текста: русские слова приводятся к основе."""
+    result = []
+    for word in WORD_RE.findall(text.lower().replace('ё', 'е')):
+        if CYRILLIC_RE.search(word):
+            word = stem(word)
+        if word:
+            result.append(word)
+    return result
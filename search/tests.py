@@ -0,0 +1,128 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts.models import Comment, Post
+from search import index
+from search.backends import FTS5Backend, InvertedIndexBackend
+from search.models import IndexedTerm
+from search.stemmer import stem, terms
+
+User = get_user_model()
+
+
+class StemmerTest(TestCase):
+
+    def test_word_forms_share_stem(self):
+        for forms in (
+            ('книга', 'книги', 'книгой', 'книге'),
+            ('красивая', 'красивый', 'красивые'),
+            ('публикация', 'публикации', 'публикацией'),
+        ):
+            self.assertEqual(len({stem(word) for word in forms}), 1, forms)
+
+    def test_terms(self):
+        self.assertEqual(
+            terms('Ёжики читают Python 3'),
+            ['ежик', 'чита', 'python', '3']
+        )
+
+
+class SearchMixin:
+    backend = None
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username='Osol', email='rs.s@skynet.com', password='qwerty123'
+        )
+        self.books = Post.objects.create(
+            text='Читаю интересные книги по вечерам', author=self.user)
+        self.cats = Post.objects.create(
+            text='Котики спят весь день', author=self.user)
+        self.comment = Comment.objects.create(
+            post=self.cats, author=self.user, text='А мой кот любит книгу')
+
+    def search(self, query):
+        response = self.client.get(reverse('search'), {'q': query})
+        self.assertEqual(response.status_code, 200)
+        return [post.pk for post in response.context['page']]
+
+    def test_backend(self):
+        self.assertIsInstance(index.get_backend(), self.backend)
+
+    def test_stemmed_and_ranked(self):
+        # запись о книгах выше записи, где книга лишь в комментарии
+        self.assertEqual(self.search('книга'), [self.books.pk, self.cats.pk])
+        self.assertEqual(self.search('интересная книжка'), [])
+        self.assertEqual(self.search('интересной книгой'), [self.books.pk])
+
+    def test_index_follows_changes(self):
+        self.books.text = 'Теперь только журналы'
+        self.books.save()
+        self.assertEqual(self.search('журналов'), [self.books.pk])
+        self.assertEqual(self.search('книги'), [self.cats.pk])
+
+        self.comment.delete()
+        self.assertEqual(self.search('книги'), [])
+
+        self.cats.delete()
+        self.assertEqual(self.search('котики'), [])
+
+    def test_rebuild(self):
+        index.get_backend().clear()
+        self.assertEqual(self.search('книги'), [])
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        self.assertIn('3', out.getvalue())
+        self.assertEqual(self.search('книги'), [self.books.pk, self.cats.pk])
+
+    def test_admin_uses_index(self):
+        admin = User.objects.create_superuser(
+            'admin', 'admin@skynet.com', 'qwerty123')
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_comment_changelist'), {'q': 'книгами'})
+        self.assertEqual(
+            list(response.context['cl'].result_list), [self.comment])
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'коты'})
+        self.assertEqual(list(response.context['cl'].result_list), [])
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'котик'})
+        self.assertEqual(list(response.context['cl'].result_list), [self.cats])
+
+
+class FTS5SearchTest(SearchMixin, TestCase):
+    backend = FTS5Backend
+
+    def test_fts_table(self):
+        self.assertIn(
+            FTS5Backend.table, connection.introspection.table_names())
+        self.assertFalse(IndexedTerm.objects.exists())
+
+
+@override_settings(SEARCH_BACKEND='inverted')
+class InvertedIndexSearchTest(SearchMixin, TestCase):
+    backend = InvertedIndexBackend
+
+    def test_search_does_not_count_tables(self):
+        with CaptureQueriesContext(connection) as queries:
+            hits = InvertedIndexBackend().search(terms('книга'))
+        self.assertEqual(len(hits), 2)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'COUNT(*)' in query['sql'] and (
+                'FROM "posts_post"' in query['sql']
+                or 'FROM "posts_comment"' in query['sql'])
+        ])
+
+    def test_terms_stored(self):
+        self.assertEqual(
+            IndexedTerm.objects.filter(post=self.cats).count(),
+            len(terms(self.cats.text)) + len(terms(self.comment.text))
+        )
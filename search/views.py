@@ -0,0 +1,20 @@
+from django.core.paginator import Paginator
+from django.shortcuts import render
+
+from posts.models import Post
+
+from . import index
+
+
+def search(request):
+    query = request.GET.get('q', '').strip()
+    post_ids = index.search_posts(query) if query else []
+    paginator = Paginator(post_ids, 10)
+    page = paginator.get_page(request.GET.get('page'))
+    posts = Post.objects.feed().in_bulk(page.object_list)
+    page.object_list = [posts[pk] for pk in page.object_list if pk in posts]
+    return render(
+        request,
+        'search.html',
+        {'query': query, 'page': page, 'paginator': paginator}
+    )
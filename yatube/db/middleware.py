@@ -0,0 +1,40 @@
+from django.conf import settings
+
+from . import routers
+
+STICKY_COOKIE = 'use_primary'
+
+
+class ReplicaRoutingMiddleware:
+    """Разрешает чтение с реплик представлениям из REPLICA_READ_VIEWS.
+
+    После запроса, который что-то записал, ставит cookie: следующие
+    REPLICA_STICKY_SECONDS секунд этот клиент читает с основной базы и
+    видит свои изменения, даже если реплики отстают.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.reset()
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                response.set_cookie(
+                    STICKY_COOKIE,
+                    '1',
+                    max_age=settings.REPLICA_STICKY_SECONDS,
+                    httponly=True,
+                    samesite='Lax',
+                )
+            return response
+        finally:
+            routers.reset()
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and STICKY_COOKIE not in request.COOKIES
+                and request.resolver_match.url_name
+                in settings.REPLICA_READ_VIEWS):
+            routers.allow_replica()
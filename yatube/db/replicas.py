@@ -0,0 +1,22 @@
+import sqlite3
+
+from django.db import connections
+
+
+def sync(primary, replica):
+    """Скопировать основную SQLite-базу в реплику через backup API.
+
+    Нужен для локальной работы и тестов с репликами-файлами; в бою
+    реплики поддерживает сама инфраструктура (Litestream, LiteFS…).
+    """
+    source = connections[primary]
+    target = connections[replica]
+    if target.vendor != 'sqlite' or source.vendor != 'sqlite':
+        raise ValueError('Синхронизировать можно только базы SQLite')
+    source.ensure_connection()
+    target.ensure_connection()
+    try:
+        source.connection.backup(target.connection)
+    except sqlite3.Error:
+        target.close()
+        raise
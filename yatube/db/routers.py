@@ -0,0 +1,69 @@
+"""Чтение с реплик для представлений, которые только читают.
+
+Реплика разрешается на время запроса middleware'ом (см. middleware.py);
+вне такого запроса, в транзакции и для приложений из PRIMARY_APPS всё
+читается с основной базы. Любая запись идёт в основную базу и отмечается,
+чтобы middleware закрепил пользователя за ней на время отставания реплик.
+"""
+import random
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# сессии и очередь задач читаются там же, где пишутся
+PRIMARY_APPS = {'sessions', 'jobs'}
+
+_state = threading.local()
+
+
+def reset():
+    _state.replica = False
+    _state.wrote = False
+
+
+def allow_replica():
+    _state.replica = True
+
+
+def replica_allowed():
+    return getattr(_state, 'replica', False)
+
+
+def wrote():
+    return getattr(_state, 'wrote', False)
+
+
+@contextmanager
+def use_primary():
+    """Читать с основной базы внутри блока, например для данных,
+    которые пойдут в общий кэш."""
+    previous = replica_allowed()
+    _state.replica = False
+    try:
+        yield
+    finally:
+        _state.replica = previous
+
+
+class ReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.DATABASE_REPLICAS
+        if (not replicas or not replica_allowed()
+                or model._meta.app_label in PRIMARY_APPS
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # реплики — копии основной базы
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
@@ -0,0 +1,46 @@
+"""SQLite с настройками соединения для боевой нагрузки.
+
+Дополнительные ключи OPTIONS:
+
+* PRAGMAS — словарь PRAGMA, выполняемых при каждом новом соединении
+  (journal_mode, synchronous, mmap_size, cache_size, busy_timeout…);
+* TRANSACTION_MODE — чем открывать транзакции: DEFERRED (как в Django),
+  IMMEDIATE или EXCLUSIVE.
+
+С IMMEDIATE блок atomic сразу берёт блокировку на запись и при занятой
+базе ждёт busy timeout на входе. С DEFERRED транзакция, начавшая с
+чтения, получает «database is locked» посреди работы без ожидания: SQLite
+не может повысить её до записи, не нарушив изоляцию.
+"""
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = dict(options.get('PRAGMAS', {}))
+        self.transaction_mode = options.get(
+            'TRANSACTION_MODE', 'DEFERRED').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'Неизвестный TRANSACTION_MODE: {self.transaction_mode}')
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        kwargs.pop('PRAGMAS', None)
+        kwargs.pop('TRANSACTION_MODE', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
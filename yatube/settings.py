@@ -1,5 +1,7 @@
 import os
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 
@@ -9,8 +11,20 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 # SECURITY WARNING: keep the secret key used in production secret!
 SECRET_KEY = 'p6j@4i2!o_hf3krd)u=e)=nv&h$fy1h__%)v+r*6t-_1a9=zc*'
 
+# Окружение задаётся переменной YATUBE_ENV:
+#   prod — по умолчанию: без DEBUG, модули debug_toolbar не импортируются
+#          вовсе, а его middleware не стоит в цепочке;
+#   dev  — DEBUG, debug_toolbar, статика и медиа раздаются самим Django;
+#   test — как prod, но с быстрым хешированием паролей.
+# `manage.py test` без явного YATUBE_ENV запускается в окружении test.
+ENVIRONMENTS = ('prod', 'dev', 'test')
+ENVIRONMENT = os.environ.get('YATUBE_ENV', 'prod')
+if ENVIRONMENT not in ENVIRONMENTS:
+    raise ImproperlyConfigured(
+        f'YATUBE_ENV={ENVIRONMENT}: ожидается одно из {ENVIRONMENTS}')
+
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = False
+DEBUG = ENVIRONMENT == 'dev'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -33,11 +47,17 @@ INSTALLED_APPS = [
     'django.contrib.staticfiles',
     'users',
     'posts',
+    'jobs',
+    'search',
+    'api',
+    'metrics',
+    'bench',
     'sorl.thumbnail',
-    'debug_toolbar',
 ]
 
 MIDDLEWARE = [
+    'metrics.middleware.MetricsMiddleware',
+    'yatube.db.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -45,21 +65,35 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+if DEBUG:
+    INSTALLED_APPS += ['debug_toolbar']
+    MIDDLEWARE += ['debug_toolbar.middleware.DebugToolbarMiddleware']
+
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
 
+if ENVIRONMENT == 'test':
+    PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
+# Вне DEBUG шаблоны компилируются один раз и живут в памяти процесса.
+# С TEMPLATE_PRELOAD воркер компилирует их все при старте (yatube/wsgi.py)
+# и связывает {% include %} с постоянным именем с готовым шаблоном;
+# `manage.py check --deploy` падает, если какой-то шаблон не компилируется.
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+TEMPLATE_PRELOAD = not DEBUG
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [TEMPLATES_DIR],
-        'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
                 'django.template.context_processors.debug',
@@ -67,6 +101,9 @@ TEMPLATES = [
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
             ],
+            'loaders': TEMPLATE_LOADERS if DEBUG else [
+                ('django.template.loaders.cached.Loader', TEMPLATE_LOADERS),
+            ],
         },
     },
 ]
@@ -76,13 +113,64 @@ WSGI_APPLICATION = 'yatube.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# Профиль SQLite задаётся переменной окружения YATUBE_DB_PROFILE:
+#  plain — настройки Django по умолчанию;
+#  tuned — WAL (читатели не ждут писателей), synchronous=NORMAL,
+#  mmap и большой кэш страниц, ожидание блокировки вместо ошибки,
+#  постоянные соединения и BEGIN IMMEDIATE для транзакций записи.
+DB_PROFILE = os.environ.get('YATUBE_DB_PROFILE', 'tuned')
+DB_PROFILES = {
+    'plain': {
+        'ENGINE': 'django.db.backends.sqlite3',
+    },
+    'tuned': {
+        'ENGINE': 'yatube.db.sqlite',
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'timeout': 20,
+            'TRANSACTION_MODE': 'IMMEDIATE',
+            'PRAGMAS': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 20000,
+                'mmap_size': 256 * 1024 * 1024,
+                'cache_size': -64 * 1024,
+                'temp_store': 'MEMORY',
+            },
+        },
+    },
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        **DB_PROFILES[DB_PROFILE],
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
     }
 }
 
+# Реплики для чтения: YATUBE_DB_REPLICAS — пути к копиям базы через
+# os.pathsep. Представления из REPLICA_READ_VIEWS читают со случайной
+# реплики; клиент, который что-то записал, REPLICA_STICKY_SECONDS секунд
+# читает с основной базы. В тестах реплики — зеркала основной базы.
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+        filter(None, os.environ.get('YATUBE_DB_REPLICAS', '').split(
+            os.pathsep)), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = {
+        **DB_PROFILES[DB_PROFILE],
+        'NAME': path,
+        'TEST': {'MIRROR': 'default'},
+    }
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['yatube.db.routers.ReplicaRouter']
+REPLICA_READ_VIEWS = (
+    'index', 'group_posts', 'profile', 'post', 'post_comments',
+    'follow_index',
+)
+REPLICA_STICKY_SECONDS = 10
+
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
 
@@ -122,22 +210,161 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Файлы называются по SHA-256 содержимого: одинаковые загрузки хранятся
+# один раз, а удаляются вместе с последней ссылкой. Загруженные раньше
+# файлы переносит команда migrate_media.
+DEFAULT_FILE_STORAGE = 'posts.storage.ContentAddressedStorage'
+# Миниатюры sorl ищутся по имени, которое sorl выбрал сам, поэтому
+# хранятся в обычном хранилище: иначе каждая отрисовка создавала бы
+# миниатюру заново и добавляла ссылку в StoredFile.
+THUMBNAIL_STORAGE = 'django.core.files.storage.FileSystemStorage'
 
 # Login
 LOGIN_URL = '/auth/login/'
 LOGIN_REDIRECT_URL = 'index'
 LOGOUT_REDIRECT_URL = 'index'
 
-#  подключаем движок filebased.EmailBackend
-EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
+#  письма ставятся в очередь задач, а воркер отправляет их
+#  через filebased.EmailBackend
+EMAIL_BACKEND = 'jobs.mail.QueuedEmailBackend'
+JOBS_EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 # указываем директорию, в которую будут складываться файлы писем
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 # Идентификатор текущего сайта
 SITE_ID = 1
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+# Кэш выбирается переменной окружения YATUBE_CACHE:
+#   locmem — свой кэш в каждом процессе (по умолчанию);
+#   file   — файловый кэш Django, общий для процессов машины;
+#   sqlite — общий кэш в файле SQLite;
+#   tiered — LRU в памяти процесса перед общим SQLite-кэшем.
+CACHE_BACKEND = os.environ.get('YATUBE_CACHE', 'locmem')
+CACHE_DIR = os.environ.get('YATUBE_CACHE_DIR', os.path.join(BASE_DIR, 'cache'))
+
+if CACHE_BACKEND == 'file':
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'files'),
+            'OPTIONS': {'MAX_ENTRIES': 10000},
+        }
     }
+elif CACHE_BACKEND in ('sqlite', 'tiered'):
+    CACHES = {
+        'shared': {
+            'BACKEND': 'yatube.cache_backends.SQLiteCache',
+            'LOCATION': os.path.join(CACHE_DIR, 'cache.sqlite3'),
+            'OPTIONS': {'MAX_ENTRIES': 100000},
+        }
+    }
+    if CACHE_BACKEND == 'tiered':
+        CACHES['default'] = {
+            'BACKEND': 'yatube.cache_backends.TieredCache',
+            'OPTIONS': {
+                'SHARED': 'shared',
+                'LOCAL_MAX_ENTRIES': 2000,
+                'LOCAL_TIMEOUT': 5,
+                # поколения лент читаются только из общего уровня,
+                # иначе инвалидация запаздывала бы по процессам
+                'BYPASS_PREFIXES': ('feed:gen:',),
+            },
+        }
+    else:
+        CACHES['default'] = CACHES['shared']
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+
+if CACHE_BACKEND != 'locmem':
+    # Сессии и хранилище миниатюр sorl живут в общем кэше; в локальном
+    # уровне сессии держать нельзя: выход в одном процессе не увидят другие.
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+    SESSION_CACHE_ALIAS = 'shared' if 'shared' in CACHES else 'default'
+    THUMBNAIL_CACHE = SESSION_CACHE_ALIAS
+
+# Лента подписок: новые записи раздаются подписчикам при публикации
+# и хранятся в TimelineEntry (не больше TIMELINE_LENGTH на человека).
+# Записи авторов, у которых подписчиков больше
+# TIMELINE_FANOUT_MAX_FOLLOWERS, подмешиваются в ленту при чтении.
+# Раздачу на TIMELINE_FANOUT_INLINE_MAX подписчиков и меньше делаем прямо
+# в запросе, на большее число — фоновой задачей.
+TIMELINE_FANOUT = True
+TIMELINE_LENGTH = 800
+TIMELINE_FANOUT_MAX_FOLLOWERS = 1000
+TIMELINE_FANOUT_INLINE_MAX = 50
+
+# Кэш страниц лент: страница считается свежей FEED_CACHE_TTL секунд и
+# сбрасывается сразу при изменении записей, групп или комментариев.
+# Устаревшая копия отдаётся ещё FEED_CACHE_STALE_TTL секунд, пока один
+# запрос перестраивает страницу под блокировкой.
+FEED_CACHE_TTL = 300
+FEED_CACHE_STALE_TTL = 3600
+if CACHE_BACKEND == 'locmem':
+    # поколения лент у каждого процесса свои: сброс после записи виден
+    # только процессу, который её сделал. Записи страницы сверяются с
+    # базой (feed_cache.page_state), а то, что сверка не видит, остаётся
+    # старым не дольше прежнего cache_page(20).
+    FEED_CACHE_TTL = FEED_CACHE_STALE_TTL = 20
+FEED_CACHE_LOCK_TIMEOUT = 10
+FEED_CACHE_LOCK_WAIT = 0.5
+
+# Комментарии на странице записи: сервер рендерит не больше
+# COMMENTS_PAGE_SIZE штук, остальные подгружаются страницами по курсору.
+COMMENTS_PAGE_SIZE = 20
+
+# Загрузки пишутся кусками прямо во временный файл, загрузка больше
+# FILE_UPLOAD_MAX_SIZE обрывается ответом 400. Размеры картинки форма
+# проверяет по заголовку файла. Воркер затем уменьшает её до
+# IMAGE_MAX_SIDE по большей стороне и перекодирует в IMAGE_FORMAT
+# (WEBP или JPEG, прогрессивный) без метаданных.
+FILE_UPLOAD_HANDLERS = ['posts.uploads.BoundedUploadHandler']
+FILE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+# Временный файл создаётся с правами 0600 и переносится в MEDIA_ROOT
+# как есть: веб-сервер под другим пользователем его бы не прочитал.
+FILE_UPLOAD_PERMISSIONS = 0o644
+FILE_UPLOAD_DIRECTORY_PERMISSIONS = 0o755
+IMAGE_UPLOAD_MAX_PIXELS = 50 * 1000 * 1000
+IMAGE_MAX_SIDE = 1920
+IMAGE_FORMAT = 'WEBP'
+IMAGE_QUALITY = 82
+
+# Сколько живёт закэшированный HTML карточки записи. Ключ включает
+# версию записи, поэтому правка или комментарий сразу дают новый ключ.
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Очередь фоновых задач в базе (приложение jobs, `manage.py worker`).
+# Взятая задача скрыта от других воркеров JOBS_VISIBILITY_TIMEOUT секунд;
+# упавшая повторяется через JOBS_RETRY_DELAY * 2 ** (попытка - 1) секунд.
+# С JOBS_EAGER задачи выполняются сразу, в том же потоке.
+JOBS_EAGER = False
+JOBS_MAX_ATTEMPTS = 3
+JOBS_VISIBILITY_TIMEOUT = 300
+JOBS_RETRY_DELAY = 10
+
+# Полнотекстовый поиск: fts5 — виртуальная таблица SQLite FTS5,
+# inverted — обратный индекс в обычной таблице, auto — FTS5, если есть.
+SEARCH_BACKEND = 'auto'
+SEARCH_MAX_RESULTS = 200
+
+# Метрики запросов: число и время SQL, рендеринг шаблонов и кэш по именам
+# URL. Отчёт — /metrics/ для персонала, формат Prometheus —
+# /metrics/prometheus/ (персоналу или с заголовком
+# «Authorization: Bearer <METRICS_TOKEN>»). Превышение бюджета
+# SQL-запросов представления пишется в лог yatube.metrics.
+METRICS_ENABLED = True
+METRICS_TOKEN = os.environ.get('YATUBE_METRICS_TOKEN', '')
+QUERY_BUDGETS = {
+    'index': 5,
+    'group_posts': 5,
+    'profile': 5,
+    'follow_index': 5,
+    'post': 4,
+    'post_comments': 4,
+    'add_comment': 10,
+    'new_post': 20,
+    'search': 6,
 }
@@ -0,0 +1,104 @@
+"""Предварительная компиляция шаблонов.
+
+Кэширующий загрузчик разбирает шаблон при первом обращении, поэтому
+первые запросы после выкладки медленнее остальных. preload() при старте
+воркера компилирует все шаблоны заранее и подставляет в {% include %} с
+постоянным именем уже скомпилированный шаблон: такой include больше не
+ищет шаблон ни в загрузчике, ни в кэше render_context.
+"""
+import os
+
+from django.core import checks
+from django.template import Engine, TemplateDoesNotExist, TemplateSyntaxError
+from django.template.loader_tags import IncludeNode
+from django.template.loaders.cached import Loader as CachedLoader
+
+
+class CompiledInclude:
+    """Замена FilterExpression имени шаблона в IncludeNode."""
+
+    def __init__(self, template):
+        self.template = template
+
+    def resolve(self, context):
+        return self.template
+
+
+def template_dirs(loaders):
+    for loader in loaders:
+        if isinstance(loader, CachedLoader):
+            yield from template_dirs(loader.loaders)
+        elif hasattr(loader, 'get_dirs'):
+            yield from loader.get_dirs()
+
+
+def template_names(engine):
+    """Имена всех шаблонов, которые видят загрузчики движка."""
+    names = set()
+    for directory in template_dirs(engine.template_loaders):
+        for root, _, files in os.walk(directory):
+            for filename in files:
+                path = os.path.join(root, filename)
+                names.add(os.path.relpath(path, directory).replace(
+                    os.sep, '/'))
+    return sorted(names)
+
+
+def constant_includes(template):
+    for node in template.nodelist.get_nodes_by_type(IncludeNode):
+        expression = node.template
+        if isinstance(expression, CompiledInclude):
+            continue
+        if not expression.filters and isinstance(expression.var, str):
+            yield node, expression.var
+
+
+def compile_all(engine=None):
+    """Скомпилировать все шаблоны. Возвращает ({имя: шаблон}, ошибки)."""
+    engine = engine or Engine.get_default()
+    templates = {}
+    errors = []
+    for name in template_names(engine):
+        try:
+            templates[name] = engine.get_template(name)
+        except (TemplateSyntaxError, UnicodeDecodeError) as error:
+            errors.append((name, error))
+    return templates, errors
+
+
+def is_cached(engine):
+    return any(isinstance(loader, CachedLoader)
+               for loader in engine.template_loaders)
+
+
+def preload(engine=None):
+    """Прогреть кэширующий загрузчик и связать постоянные include.
+
+    Без кэширующего загрузчика (DEBUG) шаблоны перечитываются с диска,
+    и связывать include нельзя: правка вложенного шаблона не была бы
+    видна. Возвращает число скомпилированных шаблонов.
+    """
+    engine = engine or Engine.get_default()
+    if not is_cached(engine):
+        return 0
+    templates, _ = compile_all(engine)
+    for template in templates.values():
+        for node, included in constant_includes(template):
+            try:
+                node.template = CompiledInclude(engine.get_template(included))
+            except (TemplateDoesNotExist, TemplateSyntaxError):
+                # виджеты admin подключают шаблоны рендерера форм, которых
+                # этот движок не видит; такие include ищутся как обычно
+                pass
+    return len(templates)
+
+
+def check_templates(app_configs=None, **kwargs):
+    _, errors = compile_all()
+    return [
+        checks.Error(
+            f'Шаблон {name} не компилируется: {error}',
+            id='yatube.E001',
+        )
+        for name, error in errors
+    ]
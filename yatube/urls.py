@@ -4,7 +4,6 @@ from django.contrib.flatpages import views
 from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
-import debug_toolbar
 
 
 handler404 = "posts.views.page_not_found"  # noqa
@@ -20,6 +19,9 @@ urlpatterns = [
     path('about-spec/', views.flatpage, {'url': '/about-spec/'}, name='terms'),
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
+    path('api/v1/', include('api.urls')),
+    path('metrics/', include('metrics.urls')),
+    path('search/', include('search.urls')),
     path('', include('posts.urls')),
 ]
 
@@ -32,5 +34,8 @@ if settings.DEBUG:
         settings.STATIC_URL,
         document_root=settings.STATIC_ROOT
     )
-    urlpatterns += (path('__debug__/', include(debug_toolbar.urls)),)
+
+if 'debug_toolbar' in settings.INSTALLED_APPS:
+    import debug_toolbar
+    urlpatterns += [path('__debug__/', include(debug_toolbar.urls))]
 
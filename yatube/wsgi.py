@@ -1,7 +1,13 @@
 import os
 
+from django.conf import settings
 from django.core.wsgi import get_wsgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# шаблоны компилируются при старте воркера, а не на первых запросах
+if settings.TEMPLATE_PRELOAD:
+    from yatube.templating import preload
+    preload()